@@ -0,0 +1,97 @@
+# This module defines the NumPy kernels of the batch forms of the
+# heuristics of the search module.  NumPy is optional: without it
+# HAVE_NUMPY is False and the search module evaluates the heuristics one
+# state at a time.
+#----------------------------------------------------------------------
+
+try:
+    import numpy as np
+    HAVE_NUMPY = True
+except ImportError:
+    np = None
+    HAVE_NUMPY = False
+
+from pieces import BITBOARD_GUARD
+from itertools import chain
+
+#----------------------------------------------------------------------
+
+def coordinates(states):
+    """
+    Anchors of the pieces of a batch of states with the same piece
+    classes, as an integer array of shape (states, pieces, 2):
+    coords[k, i] = (x, y) of piece i of state k
+    """
+    # La clave de TutrisState (nombres, x0, y0, x1, y1, ...) ya esta calculada
+    # y aplanada: se leen las coordenadas de ahi
+    n = len(states)
+    pieces = len(states[0].piece_list)
+    flat = chain.from_iterable(state.key()[1:] for state in states)
+    return np.fromiter(flat, dtype=np.int64, count=n * pieces * 2).reshape(n, pieces, 2)
+
+def manhattan(coords, goal_coords):
+    # Manhattan distance of every piece to its goal anchor, shape (states, pieces)
+    return np.abs(coords - goal_coords[np.newaxis]).sum(axis=2)
+
+def occupancy_grids(coords, shapes, max_x, max_y):
+    """
+    Boolean occupancy grids of a batch of states with the layout of the
+    bitboards (see pieces.board_layout), shape (states, max_y +
+    2*BITBOARD_GUARD, max_x + 2*BITBOARD_GUARD): the cell (x, y) is
+    grid[k, y + BITBOARD_GUARD, x + BITBOARD_GUARD].  Only pieces that
+    stick out of the board (invalid states) occupy guard cells, and pieces
+    too far from the board to have a footprint (Piece.mask) are dropped.
+    """
+    pad = BITBOARD_GUARD
+    n = coords.shape[0]
+    grids = np.zeros((n, max_y + 2 * pad, max_x + 2 * pad), dtype=bool)
+    states = np.arange(n)
+    for i, shape in enumerate(shapes):
+        xs = coords[:, i, 0]
+        ys = coords[:, i, 1]
+        present = (xs >= -pad) & (xs <= max_x) & (ys >= -pad) & (ys <= max_y)
+        for (dx, dy) in shape:
+            grids[states[present], ys[present] + dy + pad, xs[present] + dx + pad] = True
+    return grids
+
+def blocked_paths(coords, goal_coords, shapes, max_x, max_y):
+    """
+    Vectorized form of the path check of h3_blocking_pieces: for every
+    state and piece, the number (0, 1 or 2) of straight paths towards the
+    goal anchor (horizontal along the current row, vertical along the
+    current column) with some intermediate placement of the piece whose
+    footprint overlaps the occupied cells.  Shape (states, pieces).
+
+    For each distinct shape, the overlap of its footprint with the occupied
+    cells is computed at every anchor of every state at once (an OR of
+    shifted grids); each piece then only reads the row and the column of
+    its own anchor.
+    """
+    pad = BITBOARD_GUARD
+    n = coords.shape[0]
+    grids = occupancy_grids(coords, shapes, max_x, max_y)
+    # Anclas con huella (Piece.mask no es None): x en [-pad, max_x], y en [-pad, max_y]
+    xs = np.arange(-pad, max_x + 1)
+    ys = np.arange(-pad, max_y + 1)
+    overlaps = {}
+    for shape in set(shapes):
+        overlap = np.zeros((n, len(ys), len(xs)), dtype=bool)
+        for (dx, dy) in shape:
+            overlap |= grids[:, dy:dy + len(ys), dx:dx + len(xs)]
+        overlaps[shape] = overlap
+    states = np.arange(n)
+    blocked = np.zeros(coords.shape[:2], dtype=np.int64)
+    for i, shape in enumerate(shapes):
+        cx = coords[:, i, 0]
+        cy = coords[:, i, 1]
+        gx, gy = goal_coords[i]
+        # Fila y columna del ancla actual (recortadas si no tienen huella,
+        # y descartadas abajo)
+        row_hits = overlaps[shape][states, np.clip(cy + pad, 0, len(ys) - 1)]
+        column_hits = overlaps[shape][states, :, np.clip(cx + pad, 0, len(xs) - 1)]
+        # Solo cuentan las anclas estrictamente entre la actual y la objetivo
+        row_between = ((xs - cx[:, np.newaxis]) * (xs - gx) < 0) & ((cy >= -pad) & (cy <= max_y))[:, np.newaxis]
+        column_between = ((ys - cy[:, np.newaxis]) * (ys - gy) < 0) & ((cx >= -pad) & (cx <= max_x))[:, np.newaxis]
+        blocked[:, i] = ((row_hits & row_between).any(axis=1).astype(np.int64) +
+                         (column_hits & column_between).any(axis=1))
+    return blocked
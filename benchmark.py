@@ -0,0 +1,197 @@
+# Micro-benchmarks for the Tutris search code
+#----------------------------------------------------------------------
+
+from datastructures import *
+from state import *
+from search import *
+import multiprocessing, time, tracemalloc
+
+#----------------------------------------------------------------------
+# Frontier structures
+
+def bench_frontier(frontier_class, sizes=(10**3, 10**4, 10**5, 10**6, 2 * 10**6),
+                   ops=100000, key=None):
+    """
+    Fills a frontier with n elements and then measures the mean time of
+    one insert + remove pair at that size.  With O(1) operations the
+    time per pair must not grow with n.
+    Returns a list of (n, nanoseconds per insert+remove pair).
+    """
+    results = []
+    for n in sizes:
+        frontier = frontier_class(key) if key else frontier_class()
+        for i in range(n):
+            frontier.insert(i)
+        start = time.perf_counter()
+        for i in range(n, n + ops):
+            frontier.insert(i)
+            frontier.remove()
+        elapsed = time.perf_counter() - start
+        results.append((n, elapsed / ops * 1e9))
+    return results
+
+def run_frontier_benchmark():
+    print("=" * 50)
+    print(" Frontier micro-benchmark (ns por insert+remove) ")
+    print("=" * 50)
+    for frontier_class in (Stack, Queue):
+        for key in (None, lambda x: x):
+            label = frontier_class.__name__ + (" (indexada)" if key else "")
+            print("\n" + label + ":")
+            for n, ns in bench_frontier(frontier_class, key=key):
+                print("  n = %9d  ->  %7.1f ns" % (n, ns))
+
+#----------------------------------------------------------------------
+# State validation
+
+def sample_state(bitboard=False):
+    # Estado inicial init_list3 de tutrisproblem
+    return TutrisState([PieceBar(4,6), PieceL(1,5), PieceS(3,4), PieceSquare(4,2)],
+                       bitboard=bitboard)
+
+def full_copy_next_states(state):
+    """
+    Reference expansion without structural sharing: every successor copies
+    all the pieces and validates the whole state with the set-based is_valid
+    """
+    new_states = []
+    for i in range(len(state.piece_list)):
+        for mov in ['LEFT', 'RIGHT', 'DOWN']:
+            piezas = [p.copy() for p in state.piece_list]
+            piezas[i].apply_movement(mov)
+            nuevo_estado = TutrisState(piezas, state.max_x, state.max_y)
+            if nuevo_estado.is_valid():
+                new_states.append((nuevo_estado, (i, mov)))
+    return new_states
+
+def bench_next_states(state, expand=None, repeat=20000):
+    """
+    Returns the mean time in microseconds of state.next_states() (or of
+    expand(state) if given)
+    """
+    start = time.perf_counter()
+    for i in range(repeat):
+        # Estado recien creado, sin mascara de ocupacion en cache
+        fresh = TutrisState(state.piece_list, state.max_x, state.max_y, state.bitboard, state.grid)
+        if expand:
+            expand(fresh)
+        else:
+            fresh.next_states()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+def run_validation_benchmark():
+    print("=" * 50)
+    print(" next_states: copia completa vs sucesores incrementales ")
+    print("=" * 50)
+    full_time = bench_next_states(sample_state(), full_copy_next_states)
+    inc_time = bench_next_states(sample_state())
+    print("  Copia y validacion completa (conjuntos): %7.2f us" % full_time)
+    print("  Incremental:                             %7.2f us" % inc_time)
+    print("  Aceleracion:                             %7.2fx" % (full_time / inc_time))
+
+#----------------------------------------------------------------------
+# Expansion engines
+
+def packed_state(max_x, max_y, pieces, seed=0):
+    """
+    Random valid state with the given number of pieces (cycling through
+    the four piece classes), or None if they do not fit in the board
+    """
+    import random
+    from scaling import random_state, piece_mix
+    rng = random.Random(seed)
+    return random_state(piece_mix(pieces, 'cycle', rng), max_x, max_y, rng)
+
+def run_expansion_benchmark(cases=((8, 8, 4), (12, 12, 8), (16, 16, 16), (24, 24, 32), (32, 32, 64))):
+    print("=" * 50)
+    print(" next_states: tablas de piezas vs rejilla NumPy ")
+    print("=" * 50)
+    import gridexpansion
+    if not gridexpansion.HAVE_NUMPY:
+        print("  NumPy no disponible")
+        return
+    for (max_x, max_y, pieces) in cases:
+        state = packed_state(max_x, max_y, pieces)
+        if state is None:
+            continue
+        repeat = max(200, 20000 // pieces)
+        tables_time = bench_next_states(state, repeat=repeat)
+        grid_time = bench_next_states(TutrisState(state.piece_list, max_x, max_y, grid=True), repeat=repeat)
+        print("  %2dx%-2d %2d piezas: tablas %8.2f us, rejilla %8.2f us (%.2fx)" % (
+            max_x, max_y, pieces, tables_time, grid_time, tables_time / grid_time))
+
+#----------------------------------------------------------------------
+# Parallel A*
+
+def parallel_instances():
+    # (name, initial state, goal state): the init_list3 instance and two
+    # random instances on larger boards (see scaling.random_instance)
+    import random
+    from scaling import random_instance, piece_mix
+    goal_state = TutrisState([PieceBar(2,7), PieceL(0,5), PieceS(5,6), PieceSquare(0,6)])
+    instances = [("init_list3", sample_state(), goal_state)]
+    rng = random.Random(7)
+    for (size, pieces, walk) in ((10, 5, 40), (12, 6, 60)):
+        init_state, goal_state = random_instance(piece_mix(pieces, 'cycle', rng), size, size, walk, rng)
+        instances.append(("%dx%d %d piezas" % (size, size, pieces), init_state, goal_state))
+    return instances
+
+def run_parallel_benchmark(workers=(1, 2, 4), heuristic=h1_manhattan):
+    """
+    hda_star against serial a_star on the same instances: speedup (serial
+    time / parallel time) and search overhead (parallel expansions /
+    serial expansions)
+    """
+    print("=" * 50)
+    print(" A* serie vs HDA* (%s, %d CPUs) " % (heuristic.__name__, multiprocessing.cpu_count()))
+    print("=" * 50)
+    for (name, init_state, goal_state) in parallel_instances():
+        start = time.perf_counter()
+        solution, expanded, generated = a_star(init_state, goal_state, heuristic)
+        serial_time = time.perf_counter() - start
+        print("  %-16s A*:   %7d expandidos %8.3f s, coste %d" % (name, expanded, serial_time, solution.g))
+        for n in workers:
+            start = time.perf_counter()
+            parallel, parallel_expanded, generated = hda_star(init_state, goal_state, heuristic, workers=n)
+            parallel_time = time.perf_counter() - start
+            print("  %-16s HDA*%d: %6d expandidos %8.3f s, coste %d, aceleracion %5.2fx, sobrecoste %5.2fx" % (
+                "", n, parallel_expanded, parallel_time, parallel.g,
+                serial_time / parallel_time, parallel_expanded / expanded))
+
+#----------------------------------------------------------------------
+# Memory
+
+def bench_memory(algorithm=breadth_first):
+    """
+    Runs algorithm from init_list3 and returns (peak bytes, stored states,
+    bytes per stored state).  The stored states are the explored states
+    plus the frontier, i.e. the initial state plus every generated node.
+    """
+    goal_state = TutrisState([PieceBar(2,7), PieceL(0,5), PieceS(5,6), PieceSquare(0,6)])
+    init_state = sample_state()
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    base, _ = tracemalloc.get_traced_memory()
+    solution, expanded, generated = algorithm(init_state, goal_state)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stored = generated + 1
+    return peak - base, stored, (peak - base) / stored
+
+def run_memory_benchmark():
+    print("=" * 50)
+    print(" Memoria por estado almacenado ")
+    print("=" * 50)
+    for algorithm in (breadth_first, uniform_cost):
+        peak, stored, per_state = bench_memory(algorithm)
+        print("  %-14s pico %8.1f KiB, %6d estados, %6.1f bytes/estado" % (
+            algorithm.__name__, peak / 1024.0, stored, per_state))
+
+#----------------------------------------------------------------------
+
+if __name__ == "__main__":
+    run_frontier_benchmark()
+    run_validation_benchmark()
+    run_expansion_benchmark()
+    run_parallel_benchmark()
+    run_memory_benchmark()
@@ -1,17 +1,34 @@
 # This module defines the classes Stack, Queue, and PriorityQueue
 #----------------------------------------------------------------------
 
+from collections import deque
+from heapq import heappush, heappop
+
+#----------------------------------------------------------------------
+
 class Stack:
     """
-    A simple list implementation of a stack.  Interface methods:
+    A deque implementation of a stack.  insert and remove take O(1) time.
+    Interface methods:
        s.is_empty() returns True if s is empty
-       s.insert(x) inserts x into s at the front
+       s.insert(x) inserts x into s at the front (alias: s.push(x))
        s.remove() removes and returns the first element from s
+           (alias: s.pop())
        s.contains(x) determines if x is contained in s
+       s.contains_key(k) determines if an element with key k is in s
+
+    The optional key function maps elements to hashable keys.  When it
+    is given, an index key -> element is kept next to the contents so
+    that contains and contains_key take O(1) time.
 
     """
-    def __init__(self):
-        self.contents = []
+    def __init__(self, key=None):
+        self.contents = deque()
+        self.key = key
+        self.index = {}
+
+    def __len__(self):
+        return len(self.contents)
 
     def is_empty(self):
         return len(self.contents) == 0
@@ -20,27 +37,49 @@ class Stack:
         if self.is_empty():
             return None
         else:
-            return self.contents.pop(0)
+            elem = self.contents.popleft()
+            _unindex(self, elem)
+            return elem
 
     def insert(self, new):
-        self.contents.insert(0, new)
+        self.contents.appendleft(new)
+        _index(self, new)
         
     def contains(self, elem):
-        return elem in self.contents
+        return _contains(self, elem)
+
+    def contains_key(self, k):
+        return k in self.index
+
+    def get(self, k):
+        return self.index.get(k)
+
+    push = insert
+    pop = remove
 
 #----------------------------------------------------------------------
 
 class Queue:
     """
-    A simple list implementation of a queue.  Interface methods:
+    A deque implementation of a queue.  insert and remove take O(1) time.
+    Interface methods:
        q.is_empty() returns True if q is empty
-       q.insert(x) inserts x into q at the end
+       q.insert(x) inserts x into q at the end (alias: q.push(x))
        q.remove() removes and returns the first element from q
+           (alias: q.pop())
        q.contains(x) determines if x is contained in q
+       q.contains_key(k) determines if an element with key k is in q
+
+    The optional key function works as in Stack.
 
     """
-    def __init__(self):
-        self.contents = []
+    def __init__(self, key=None):
+        self.contents = deque()
+        self.key = key
+        self.index = {}
+
+    def __len__(self):
+        return len(self.contents)
 
     def is_empty(self):
         return len(self.contents) == 0
@@ -49,26 +88,56 @@ class Queue:
         if self.is_empty():
             return None
         else:
-            return self.contents.pop(0)
+            elem = self.contents.popleft()
+            _unindex(self, elem)
+            return elem
 
     def insert(self, new):
         self.contents.append(new)
+        _index(self, new)
         
     def contains(self, elem):
-        return elem in self.contents
+        return _contains(self, elem)
+
+    def contains_key(self, k):
+        return k in self.index
+
+    def get(self, k):
+        return self.index.get(k)
+
+    push = insert
+    pop = remove
 
 #----------------------------------------------------------------------
 
 class PriorityQueue:
     """
-    This is a heap implementation of a priority queue.  The insert and
+    This is a heapq implementation of a priority queue.  The insert and
     remove operations each take O(log n) time.  To create a new priority
     queue, call the constructor with a function that maps queue elements
-    to cost values.  Interface methods:
+    to cost values.  The cost of each element is computed only once, when
+    it is inserted, and stored in the heap entry together with the
+    element.  Interface methods:
        q.is_empty() returns True if q is empty
        q.insert(x) inserts x into q according to the cost of x
+           (alias: q.push(x))
        q.remove() removes and returns the lowest-cost element from q
+           (alias: q.pop())
        q.contains(x) determines if x is contained in q
+       q.contains_key(k) determines if an element with key k is in q
+       q.decrease_key(x) inserts x, or replaces the element with the
+           same key if x has a lower cost (requires a key function)
+       q.elements() returns the list of elements in q, in no particular
+           order (for example to queue them again with other costs)
+
+    The optional key function works as in Stack.  Replaced elements are
+    not searched for inside the heap: their entries are just marked as
+    removed and skipped later by remove (lazy invalidation).
+
+    Ties between elements with the same cost are broken by the optional
+    tiebreak function (lower values first) and then by insertion order.
+    For example, PriorityQueue(f, tiebreak=lambda node: -node.g) prefers
+    the deepest node among those with the same f.
 
     Example:
        q = PriorityQueue(lambda x: x)
@@ -86,99 +155,102 @@ class PriorityQueue:
 
     """
     # costFunction is a function that maps queue elements to cost values
-    def __init__(self, costFunction):
-        # current number of elements in queue
+    def __init__(self, costFunction, key=None, tiebreak=None):
+        # current number of (valid) elements in queue
         self.size = 0
-        # current maximum size of queue (can be changed - see insert below)
-        self.limit = 10
-        # the elements themselves (position 0 is not used)
-        self.contents = [None] * (self.limit + 1)
-        # a function that returns the cost of the element at position i
-        self.cost = lambda i: costFunction(self.contents[i])
-        
-    def contains(self, elem):
-        return elem in self.contents
-        
+        # the heap of [cost, tiebreak, counter, element] entries
+        self.contents = []
+        self.cost = costFunction
+        self.tiebreak = tiebreak
+        # insertion counter, keeps ties stable and avoids comparing elements
+        self.counter = 0
+        # optional key function and index key -> heap entry
+        self.key = key
+        self.index = {}
+
+    def __len__(self):
+        return self.size
+
     def is_empty(self):
         # returns True if the queue is empty, or else False
         return self.size == 0
 
-    def is_root(self, i):
-        # returns True if element i is the root of the heap
-        return i == 1
-    
-    def is_leaf(self, i):
-        # returns True if element i is a leaf
-        return self.left(i) == None and self.right(i) == None
-
-    def parent(self, i):
-        # returns the position of the parent of element i
-        return i // 2
-
-    def left(self, i):
-        # returns the position of the left child of element i
-        child = i * 2
-        if child > self.size:
-            return None
-        else:
-            return child
-
-    def right(self, i):
-        # returns the position of the right child of element i
-        child = i * 2 + 1
-        if child > self.size:
-            return None
-        else:
-            return child
-
-    def smallestChild(self, i):
-        # returns the position of the smallest child of element i
-        leftChild = self.left(i)
-        rightChild = self.right(i)
-        if leftChild == None:
-            return rightChild
-        elif rightChild == None:
-            return leftChild
-        elif self.cost(leftChild) < self.cost(rightChild):
-            return leftChild
-        else:
-            return rightChild
-
-    def swap(self, i, j):
-        # swaps elements in positions i and j (using parallel assignment)
-        self.contents[i], self.contents[j] = self.contents[j], self.contents[i]
-
     def insert(self, new):
         # inserts a new element into the heap
-        if self.size == self.limit:
-            # this doubles the amount of space available in self.contents
-            self.contents.extend([None] * self.size)
-            self.limit += self.size
+        tie = self.tiebreak(new) if self.tiebreak else 0
+        entry = [self.cost(new), tie, self.counter, new]
+        self.counter += 1
+        if self.key is not None:
+            self.index[self.key(new)] = entry
+        heappush(self.contents, entry)
         self.size += 1
-        self.contents[self.size] = new
-        # push new element up toward the root as far as possible
-        current = self.size
-        while not self.is_root(current):
-            parent = self.parent(current)
-            if self.cost(current) >= self.cost(parent):
-                return
-            self.swap(current, parent)
-            current = parent
 
     def remove(self):
-        # deletes the current element at the root of the heap and returns it
-        if self.size == 0:
-            return None
-        else:
-            min_val = self.contents[1]
-            self.contents[1] = self.contents[self.size]
+        # deletes the lowest-cost valid element of the heap and returns it
+        while self.contents:
+            entry = heappop(self.contents)
+            elem = entry[3]
+            if elem is _REMOVED:
+                continue
+            if self.key is not None:
+                k = self.key(elem)
+                if self.index.get(k) is entry:
+                    del self.index[k]
             self.size -= 1
-            # push new root element down into the heap as far as possible
-            current = 1
-            while not self.is_leaf(current):
-                child = self.smallestChild(current)
-                if self.cost(current) <= self.cost(child):
-                    return min_val
-                self.swap(current, child)
-                current = child
-            return min_val
\ No newline at end of file
+            return elem
+        return None
+
+    def decrease_key(self, new):
+        # inserts new, or replaces the queued element with the same key when
+        # new is cheaper.  Returns True if new has been queued
+        old = self.index.get(self.key(new))
+        if old is not None:
+            if self.cost(new) >= old[0]:
+                return False
+            old[3] = _REMOVED
+            self.size -= 1
+        self.insert(new)
+        return True
+
+    def contains(self, elem):
+        if self.key is None:
+            return any(entry[3] == elem for entry in self.contents
+                       if entry[3] is not _REMOVED)
+        return self.key(elem) in self.index
+
+    def contains_key(self, k):
+        return k in self.index
+
+    def get(self, k):
+        entry = self.index.get(k)
+        return entry[3] if entry is not None else None
+
+    def elements(self):
+        return [entry[3] for entry in self.contents if entry[3] is not _REMOVED]
+
+    push = insert
+    pop = remove
+
+#----------------------------------------------------------------------
+# Index helpers shared by Stack and Queue
+
+# marks the heap entries of PriorityQueue replaced by decrease_key
+_REMOVED = object()
+
+def _index(q, elem):
+    # registers elem in the index of q (only if q has a key function)
+    if q.key is not None:
+        q.index[q.key(elem)] = elem
+
+def _unindex(q, elem):
+    # removes elem from the index of q, unless the key now maps to
+    # another element inserted later with the same key
+    if q.key is not None:
+        k = q.key(elem)
+        if q.index.get(k) is elem:
+            del q.index[k]
+
+def _contains(q, elem):
+    if q.key is None:
+        return elem in q.contents
+    return q.key(elem) in q.index
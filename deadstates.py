@@ -0,0 +1,91 @@
+# This module defines the dead-state test of the Tutris search: pieces
+# only move LEFT, RIGHT and DOWN, so some states can never reach the goal
+# and their subtrees can be pruned, and some (initial, goal) pairs can be
+# rejected before searching.
+#----------------------------------------------------------------------
+
+class DeadStateCheck:
+    """
+    Dead states of the searches towards a goal state.  A state is dead
+    (the goal cannot be reached from it) if
+       - some piece is below its goal row (anchor y greater than the goal
+         y): no movement raises a piece
+       - two pieces are locked at their goal rows (from there they can only
+         move sideways) with some row in common, and in that row their
+         left-right order is the opposite of the goal: the cells of a piece
+         in a row are contiguous, so the two pieces cannot pass each other
+    Both are consequences of the movements, so pruning dead states keeps
+    every solution: the pruning is admissible.
+
+    TutrisState(..., dead_check=check) prunes the dead successors in
+    next_states.  Only DOWN moves can make a state dead (sideways moves of
+    a locked piece cannot change its order with another locked piece), so
+    next_states only calls dead_after after them.
+    """
+    def __init__(self, goal_state):
+        self.goal_key = goal_state.key()
+        self.rows = [p.y for p in goal_state.piece_list]
+        # Para cada pieza i, tuplas (j, desplazamiento, i a la izquierda en el
+        # objetivo) de las piezas j con alguna fila en comun en el objetivo.
+        # En esa fila i queda a la izquierda de j si x_i + desplazamiento < x_j
+        self.pairs = [[] for p in goal_state.piece_list]
+        pieces = goal_state.piece_list
+        for i, p in enumerate(pieces):
+            for j, q in enumerate(pieces):
+                if i == j:
+                    continue
+                common = (set(p.y + dy for (dx, dy) in p.shape) &
+                          set(q.y + dy for (dx, dy) in q.shape))
+                if not common:
+                    continue
+                row = min(common)
+                offset = (min(dx for (dx, dy) in p.shape if p.y + dy == row) -
+                          min(dx for (dx, dy) in q.shape if q.y + dy == row))
+                self.pairs[i].append((j, offset, p.x + offset < q.x))
+
+    def dead_after(self, state, i):
+        # True si el estado valido state, al que se ha llegado moviendo la
+        # pieza i, esta muerto
+        p = state.piece_list[i]
+        row = self.rows[i]
+        if p.y != row:
+            return p.y > row
+        for (j, offset, goal_left) in self.pairs[i]:
+            q = state.piece_list[j]
+            if q.y == self.rows[j] and (p.x + offset < q.x) != goal_left:
+                return True
+        return False
+
+    def is_dead(self, state):
+        for i, p in enumerate(state.piece_list):
+            if p.y > self.rows[i]:
+                return True
+        # En un estado no valido las piezas solapadas aun pueden separarse
+        # en cualquier orden
+        if state.occupancy() is None:
+            return False
+        return any(self.dead_after(state, i) for i in range(len(state.piece_list)))
+
+# goal key and board -> DeadStateCheck
+_CHECKS = {}
+
+def dead_state_check(goal_state):
+    key = (goal_state.key(), goal_state.max_x, goal_state.max_y)
+    check = _CHECKS.get(key)
+    if check is None:
+        check = DeadStateCheck(goal_state)
+        _CHECKS[key] = check
+    return check
+
+def unsolvable(initial_state, goal_state):
+    """
+    True if the goal provably cannot be reached from initial_state: the
+    pieces or the boards differ, the goal is not valid, or the initial
+    state is dead.  False does not mean that there is a solution.
+    """
+    if (initial_state.key()[0] != goal_state.key()[0] or
+            (initial_state.max_x, initial_state.max_y) != (goal_state.max_x, goal_state.max_y)):
+        return True
+    if goal_state.occupancy() is None:
+        return True
+    return dead_state_check(goal_state).is_dead(initial_state)
@@ -0,0 +1,120 @@
+# This module defines the exact distance tables of a goal: the distance to
+# the goal of every state of the board, computed once with a backward
+# breadth-first search and shared through a memory-mapped file
+#----------------------------------------------------------------------------
+
+from patterndb import PatternDatabase, CACHE_DIR, UNREACHABLE, backward_distances
+from pieces import piece_table
+import hashlib, os
+
+# Largest table (one byte per packed state) that build() accepts
+MAX_TABLE_SIZE = 1 << 30
+
+#----------------------------------------------------------------------------
+
+class DistanceTable:
+    """
+    Distance to the goal of every placement of all the pieces, for a fixed
+    goal and board size.  It is the pattern database of the pattern made
+    of all the pieces (see patterndb): a breadth-first search backwards
+    from the goal (reversed moves RIGHT, LEFT and UP) over the packed
+    mixed-radix encoding of the states, in which each piece contributes
+    the index of its anchor in piece_table(...).anchors.  The table keeps
+    one byte per packed state, UNREACHABLE for the states that cannot
+    reach the goal.
+
+    lookup_distance(state) is O(1) and optimal_path(state) follows the
+    distances downhill to the goal, so optimal solutions need no search at
+    all.  Tables are stored with the pattern database file format and
+    loaded with mmap: every process that uses the same goal maps the same
+    file, and the operating system shares its pages (no copies).
+    """
+    def __init__(self, database):
+        self.database = database
+        self.pattern = database.patterns[0]
+        self.table = database.tables[0]
+
+    @staticmethod
+    def build(goal_state):
+        n = len(goal_state.piece_list)
+        size = 1
+        for p in goal_state.piece_list:
+            size *= len(piece_table(p.__class__, goal_state.max_x, goal_state.max_y).anchors)
+        if size > MAX_TABLE_SIZE:
+            raise ValueError("Tabla de distancias demasiado grande: %d estados" % size)
+        pattern = tuple(range(n))
+        table = backward_distances(goal_state, pattern)
+        if UNREACHABLE - 1 in table:
+            # backward_distances acota las distancias que no caben en un byte
+            raise ValueError("Distancias mayores que %d: la tabla no seria exacta" % (UNREACHABLE - 2))
+        classes = [p.__class__ for p in goal_state.piece_list]
+        return DistanceTable(PatternDatabase(goal_state.key(), classes, goal_state.max_x,
+                                             goal_state.max_y, [pattern], [table]))
+
+    def save(self, path):
+        self.database.save(path)
+
+    @staticmethod
+    def load(path, goal_state):
+        # Returns the table stored in path, or None if the file does not
+        # belong to goal_state
+        database = PatternDatabase.load(path, goal_state)
+        if database is None or database.patterns != [tuple(range(len(goal_state.piece_list)))]:
+            return None
+        return DistanceTable(database)
+
+    def lookup_distance(self, state):
+        # Number of moves of the optimal solutions from state, or None if
+        # state cannot reach the goal
+        d = self.database.distance(self.pattern, state)
+        return None if d == UNREACHABLE else d
+
+    def optimal_path(self, state):
+        """
+        List of (state, action) pairs of an optimal solution from state
+        (the states reached by each action), or None if state cannot reach
+        the goal.  At each step the first successor one move closer to
+        the goal is taken.
+        """
+        d = self.lookup_distance(state)
+        if d is None:
+            return None
+        path = []
+        while d > 0:
+            for (next_state, action) in state.next_states():
+                if self.lookup_distance(next_state) == d - 1:
+                    break
+            else:
+                raise ValueError("Tabla de distancias inconsistente")
+            path.append((next_state, action))
+            state = next_state
+            d -= 1
+        return path
+
+#----------------------------------------------------------------------------
+
+# (goal key, max_x, max_y) -> DistanceTable of the current process
+_TABLES = {}
+
+def distance_table(goal_state, cache_dir=CACHE_DIR):
+    """
+    Returns the distance table of goal_state, loading it from cache_dir or
+    building and saving it the first time
+    """
+    key = (goal_state.key(), goal_state.max_x, goal_state.max_y)
+    table = _TABLES.get(key)
+    if table is not None:
+        return table
+    digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:16]
+    path = os.path.join(cache_dir, 'dist_%s.bin' % digest)
+    if os.path.exists(path):
+        table = DistanceTable.load(path, goal_state)
+    if table is None:
+        table = DistanceTable.build(goal_state)
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, exist_ok=True)
+        table.save(path)
+        # Se usa la copia mapeada del fichero, compartida con otros procesos
+        table = DistanceTable.load(path, goal_state)
+    _TABLES[key] = table
+    return table
@@ -0,0 +1,87 @@
+# This module defines the NumPy expansion engine of TutrisState: the board
+# is held as a grid of piece labels and the legal moves of all the pieces
+# are found at once with shifted-array collision tests.  NumPy is
+# optional: without it HAVE_NUMPY is False and TutrisState expands with
+# the piece tables (see TutrisState.next_states).
+#----------------------------------------------------------------------
+
+try:
+    import numpy as np
+    HAVE_NUMPY = True
+except ImportError:
+    np = None
+    HAVE_NUMPY = False
+
+from pieces import MOVEMENTS
+
+#----------------------------------------------------------------------
+
+class GridLayout:
+    """
+    Arrays shared by every state with the same piece classes and board:
+       offsets   (cells, 2) cell offsets of the pieces, piece after piece
+       owners    (cells,) index of the piece of each cell
+       labels    (cells,) label of the piece of each cell in the grid
+                 (piece index + 1; 0 is a free cell and -1 a wall)
+       starts    (pieces,) index of the first cell of each piece
+       shifts    (movements, 1, 2) displacement of each movement of
+                 pieces.MOVEMENTS
+    """
+    def __init__(self, classes, max_x, max_y):
+        self.max_x = max_x
+        self.max_y = max_y
+        offsets = []
+        owners = []
+        starts = []
+        for i, piece_class in enumerate(classes):
+            starts.append(len(offsets))
+            for (dx, dy) in piece_class.shape:
+                offsets.append((dx, dy))
+                owners.append(i)
+        self.offsets = np.array(offsets, dtype=np.intp)
+        self.owners = np.array(owners, dtype=np.intp)
+        self.labels = self.owners + 1
+        self.starts = np.array(starts, dtype=np.intp)
+        self.shifts = np.array([d for (movement, d) in MOVEMENTS], dtype=np.intp)[:, np.newaxis, :]
+        # Rejilla vacia con un borde de muros (los movimientos son de una celda)
+        self.empty = np.zeros((max_y + 2, max_x + 2), dtype=np.int16)
+        self.empty[0, :] = self.empty[-1, :] = -1
+        self.empty[:, 0] = self.empty[:, -1] = -1
+
+# (piece classes, max_x, max_y) -> GridLayout
+_LAYOUTS = {}
+
+def grid_layout(state):
+    classes = tuple(p.__class__ for p in state.piece_list)
+    layout = _LAYOUTS.get((classes, state.max_x, state.max_y))
+    if layout is None:
+        layout = GridLayout(classes, state.max_x, state.max_y)
+        _LAYOUTS[(classes, state.max_x, state.max_y)] = layout
+    return layout
+
+def label_grid(state, layout):
+    """
+    Grid of labels of a valid state, shape (max_y + 2, max_x + 2), and the
+    (cells, 2) array of the grid coordinates of the cells of its pieces
+    """
+    anchors = np.fromiter(state.key()[1:], dtype=np.intp).reshape(-1, 2)
+    # Coordenadas en la rejilla: desplazadas una celda por el borde
+    cells = anchors[layout.owners] + layout.offsets + 1
+    grid = layout.empty.copy()
+    grid[cells[:, 1], cells[:, 0]] = layout.labels
+    return grid, cells
+
+def legal_moves(state):
+    """
+    Boolean array (pieces, movements) of the legal moves of a valid state,
+    with the movements in the order of pieces.MOVEMENTS.  A move is legal
+    iff every cell of the piece, shifted, is a free cell or a cell of the
+    same piece.
+    """
+    layout = grid_layout(state)
+    grid, cells = label_grid(state, layout)
+    # Celdas destino de todas las piezas para cada movimiento: (movements, cells)
+    targets = cells[np.newaxis] + layout.shifts
+    hit = grid[targets[:, :, 1], targets[:, :, 0]]
+    collides = (hit != 0) & (hit != layout.labels)
+    return ~np.logical_or.reduceat(collides, layout.starts, axis=1).T
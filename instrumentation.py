@@ -0,0 +1,171 @@
+# This module defines the optional instrumentation of the search loops
+#----------------------------------------------------------------------
+
+import time, tracemalloc
+
+#----------------------------------------------------------------------
+
+class Instrumentation:
+    """
+    Cumulative timers and call counters of the phases of a search loop,
+    plus nodes expanded per second, peak frontier and explored sizes and,
+    optionally, peak memory (tracemalloc).  Phases:
+       expand      Node.expand (state.next_states included)
+       heuristic   calls to the heuristic function
+       membership  lookups in the explored set and in the frontier index
+       push, pop   insertions in and removals from the frontier
+
+    The search loops only touch the instrumentation when an object of
+    this class is passed to them: in that case they replace the frontier,
+    the explored set, the expansion and the heuristic by the timed
+    wrappers returned by frontier(), explored_set() and timed().  Without
+    it the loops run the plain objects, so disabled instrumentation costs
+    nothing.
+
+    Example:
+       instrument = Instrumentation()
+       a_star(init_state, goal_state, h1_manhattan, instrument=instrument)
+       print(instrument.summary())
+    """
+    PHASES = ('expand', 'heuristic', 'membership', 'push', 'pop')
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.times = dict.fromkeys(self.PHASES, 0.0)
+        self.calls = dict.fromkeys(self.PHASES, 0)
+        self.peak_frontier = 0
+        self.peak_explored = 0
+        self.expanded = 0
+        self.elapsed = 0.0
+        self.peak_memory = None
+        self._start_time = None
+        self._started_tracing = False
+
+    def start(self):
+        if self.trace_memory:
+            # Si tracemalloc ya estaba activo se mide el pico desde aqui
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            tracemalloc.reset_peak()
+            self._base_memory = tracemalloc.get_traced_memory()[0]
+        self._start_time = time.perf_counter()
+
+    def stop(self, expanded):
+        self.elapsed += time.perf_counter() - self._start_time
+        self.expanded += expanded
+        if self.trace_memory:
+            peak = tracemalloc.get_traced_memory()[1] - self._base_memory
+            self.peak_memory = max(self.peak_memory or 0, peak)
+            if self._started_tracing:
+                tracemalloc.stop()
+                self._started_tracing = False
+
+    def timed(self, phase, function):
+        # Envoltorio de function que acumula su tiempo en phase
+        times = self.times
+        calls = self.calls
+        clock = time.perf_counter
+        def wrapper(*args):
+            start = clock()
+            result = function(*args)
+            times[phase] += clock() - start
+            calls[phase] += 1
+            return result
+        return wrapper
+
+    def frontier(self, frontier):
+        return InstrumentedFrontier(frontier, self)
+
+    def explored_set(self):
+        return InstrumentedSet(self)
+
+    def nodes_per_second(self):
+        return self.expanded / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self):
+        """
+        Dictionary with the figures collected (can be pickled and sent
+        between processes)
+        """
+        return {
+            'times': dict(self.times),
+            'calls': dict(self.calls),
+            'elapsed': self.elapsed,
+            'nodes_per_second': self.nodes_per_second(),
+            'peak_frontier': self.peak_frontier,
+            'peak_explored': self.peak_explored,
+            'peak_memory': self.peak_memory
+        }
+
+#----------------------------------------------------------------------
+
+class InstrumentedFrontier:
+    """
+    Proxy of a frontier (Stack, Queue or PriorityQueue) that times its
+    operations and records the peak number of elements
+    """
+    def __init__(self, frontier, instrument):
+        self.frontier = frontier
+        self.instrument = instrument
+
+    def _timed(self, phase, method, *args):
+        start = time.perf_counter()
+        result = method(*args)
+        self.instrument.times[phase] += time.perf_counter() - start
+        self.instrument.calls[phase] += 1
+        return result
+
+    def _update_peak(self):
+        size = len(self.frontier)
+        if size > self.instrument.peak_frontier:
+            self.instrument.peak_frontier = size
+
+    def is_empty(self):
+        return self.frontier.is_empty()
+
+    def __len__(self):
+        return len(self.frontier)
+
+    def insert(self, new):
+        self._timed('push', self.frontier.insert, new)
+        self._update_peak()
+
+    def remove(self):
+        return self._timed('pop', self.frontier.remove)
+
+    def decrease_key(self, new):
+        result = self._timed('push', self.frontier.decrease_key, new)
+        self._update_peak()
+        return result
+
+    def contains_key(self, k):
+        return self._timed('membership', self.frontier.contains_key, k)
+
+    def get(self, k):
+        return self._timed('membership', self.frontier.get, k)
+
+    push = insert
+    pop = remove
+
+#----------------------------------------------------------------------
+
+class InstrumentedSet(set):
+    """
+    Explored set that times membership tests and records its peak size
+    """
+    def __init__(self, instrument):
+        set.__init__(self)
+        self.instrument = instrument
+
+    def __contains__(self, k):
+        start = time.perf_counter()
+        result = set.__contains__(self, k)
+        self.instrument.times['membership'] += time.perf_counter() - start
+        self.instrument.calls['membership'] += 1
+        return result
+
+    def add(self, k):
+        set.add(self, k)
+        if len(self) > self.instrument.peak_explored:
+            self.instrument.peak_explored = len(self)
@@ -0,0 +1,239 @@
+# This module defines the additive pattern databases used by the heuristic
+# h4_pattern_database of the search module
+#----------------------------------------------------------------------------
+
+from pieces import piece_table
+from collections import deque
+from itertools import combinations
+import hashlib, mmap, os, struct
+
+# Directory of the pattern database files (one file per goal and board size)
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pdb_cache')
+
+# Distance stored for the abstract states that cannot reach the goal
+UNREACHABLE = 255
+
+MAGIC = b'TPDB'
+VERSION = 1
+
+#----------------------------------------------------------------------------
+
+class PatternDatabase:
+    """
+    Exact distances to the goal of every placement of small groups of
+    pieces (patterns), ignoring the rest of the pieces:
+       - one pattern for each single piece
+       - one pattern for each pair of pieces
+    Each pattern table is computed with a breadth-first search backwards
+    from the goal (reversed moves RIGHT, LEFT and UP) in which only the
+    pieces of the pattern exist, and stored as one byte per placement.
+
+    Each action moves a single piece, so the distances of disjoint patterns
+    can be added and the sum is still a lower bound of the real distance.
+    value(state) returns the maximum, over several partitions of the pieces
+    into pairs (plus a single piece when the number of pieces is odd), of
+    the sum of the pattern distances.  The result is admissible and
+    consistent.  States with a dead pattern (that can no longer reach its
+    goal placement) get an infinite value.
+
+    Tables are saved in a binary file and loaded back with mmap, so they
+    are shared by every process that uses the same goal.
+    """
+    def __init__(self, goal_key, classes, max_x, max_y, patterns, tables):
+        self.goal_key = goal_key
+        self.max_x = max_x
+        self.max_y = max_y
+        self.patterns = patterns
+        self.tables = tables
+        self.piece_tables = [piece_table(c, max_x, max_y) for c in classes]
+        # Position (x, y) -> index of the anchor in piece_table(...).anchors
+        self.anchor_index = [dict((a, i) for i, a in enumerate(t.anchors))
+                             for t in self.piece_tables]
+        self.table_of = dict(zip(patterns, tables))
+        self.partitions = pair_partitions(len(classes))
+
+    @staticmethod
+    def build(goal_state):
+        classes = [p.__class__ for p in goal_state.piece_list]
+        n = len(classes)
+        patterns = [(i,) for i in range(n)] + list(combinations(range(n), 2))
+        tables = [backward_distances(goal_state, pattern) for pattern in patterns]
+        return PatternDatabase(goal_state.key(), classes, goal_state.max_x,
+                               goal_state.max_y, patterns, tables)
+
+    def save(self, path):
+        """
+        File layout (little endian):
+           magic 'TPDB', version (H), max_x (H), max_y (H),
+           length of repr(goal_key) (I) and repr(goal_key),
+           number of patterns (H), and for each pattern its size (B) and
+           piece indices (B each), followed by the pattern tables in the
+           same order
+        The file is written to a temporary name and renamed, so concurrent
+        readers never see a partial file.
+        """
+        goal_repr = repr(self.goal_key).encode('utf-8')
+        header = [MAGIC, struct.pack('<HHHI', VERSION, self.max_x, self.max_y, len(goal_repr)),
+                  goal_repr, struct.pack('<H', len(self.patterns))]
+        for pattern in self.patterns:
+            header.append(struct.pack('<B%dB' % len(pattern), len(pattern), *pattern))
+        tmp_path = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmp_path, 'wb') as f:
+            for chunk in header:
+                f.write(chunk)
+            for table in self.tables:
+                f.write(table)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path, goal_state):
+        # Returns the database stored in path, or None if the file does not
+        # belong to goal_state
+        with open(path, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(data)
+        if bytes(view[:4]) != MAGIC:
+            return None
+        version, max_x, max_y, goal_len = struct.unpack_from('<HHHI', view, 4)
+        pos = 4 + struct.calcsize('<HHHI')
+        goal_repr = bytes(view[pos:pos + goal_len]).decode('utf-8')
+        pos += goal_len
+        if (version != VERSION or goal_repr != repr(goal_state.key())
+                or (max_x, max_y) != (goal_state.max_x, goal_state.max_y)):
+            return None
+        (count,) = struct.unpack_from('<H', view, pos)
+        pos += 2
+        patterns = []
+        for i in range(count):
+            size = view[pos]
+            patterns.append(tuple(view[pos + 1:pos + 1 + size]))
+            pos += 1 + size
+        classes = [p.__class__ for p in goal_state.piece_list]
+        tables = []
+        for pattern in patterns:
+            size = 1
+            for i in pattern:
+                size *= len(piece_table(classes[i], max_x, max_y).anchors)
+            tables.append(view[pos:pos + size])
+            pos += size
+        return PatternDatabase(goal_state.key(), classes, max_x, max_y, patterns, tables)
+
+    def distance(self, pattern, state):
+        # Distance of the pieces of pattern to their goal placement
+        table = self.table_of[pattern]
+        index = 0
+        for i in pattern:
+            p = state.piece_list[i]
+            a = self.anchor_index[i].get((p.x, p.y))
+            if a is None:
+                return UNREACHABLE
+            index = index * len(self.anchor_index[i]) + a
+        return table[index]
+
+    def value(self, state):
+        best = 0
+        for partition in self.partitions:
+            total = 0
+            for pattern in partition:
+                d = self.distance(pattern, state)
+                if d == UNREACHABLE:
+                    return float('inf')
+                total += d
+            best = max(best, total)
+        return best
+
+#----------------------------------------------------------------------------
+
+def pair_partitions(n, limit=15):
+    """
+    Partitions of the pieces 0..n-1 into pairs (and one single piece if n
+    is odd).  All the partitions are returned for small n; at most limit
+    of them otherwise.
+    """
+    partitions = []
+    def extend(remaining, current):
+        if len(partitions) >= limit:
+            return
+        if len(remaining) == 0:
+            partitions.append(tuple(current))
+        elif len(remaining) == 1:
+            partitions.append(tuple(current) + ((remaining[0],),))
+        else:
+            first = remaining[0]
+            # With an odd number of pieces the first one may stay alone
+            if len(remaining) % 2 == 1:
+                extend(remaining[1:], current + [(first,)])
+            for j in range(1, len(remaining)):
+                rest = remaining[1:j] + remaining[j + 1:]
+                extend(rest, current + [(first, remaining[j])])
+    extend(list(range(n)), [])
+    return partitions
+
+def backward_distances(goal_state, pattern):
+    # Breadth-first search backwards from the goal placement of the pieces of
+    # pattern; returns a bytearray with the distance of every placement
+    max_x, max_y = goal_state.max_x, goal_state.max_y
+    tables = [piece_table(goal_state.piece_list[i].__class__, max_x, max_y) for i in pattern]
+    indices = [dict((a, k) for k, a in enumerate(t.anchors)) for t in tables]
+    radices = [len(t.anchors) for t in tables]
+    size = 1
+    for r in radices:
+        size *= r
+    distances = bytearray([UNREACHABLE]) * size
+
+    def encode(anchors):
+        index = 0
+        for k in range(len(anchors)):
+            index = index * radices[k] + indices[k][anchors[k]]
+        return index
+
+    start = tuple((goal_state.piece_list[i].x, goal_state.piece_list[i].y) for i in pattern)
+    distances[encode(start)] = 0
+    queue = deque([start])
+    while queue:
+        anchors = queue.popleft()
+        d = distances[encode(anchors)] + 1
+        if d >= UNREACHABLE:
+            # Distance too large to be stored: leave it as a lower bound
+            d = UNREACHABLE - 1
+        masks = [tables[k].masks[anchors[k]] for k in range(len(anchors))]
+        for k in range(len(anchors)):
+            others = 0
+            for j in range(len(anchors)):
+                if j != k:
+                    others |= masks[j]
+            for (px, py, prev_mask, enter_mask) in tables[k].unmoves[anchors[k]].values():
+                if enter_mask & others:
+                    continue
+                previous = anchors[:k] + ((px, py),) + anchors[k + 1:]
+                index = encode(previous)
+                if distances[index] == UNREACHABLE:
+                    distances[index] = d
+                    queue.append(previous)
+    return distances
+
+#----------------------------------------------------------------------------
+
+# (goal key, max_x, max_y) -> PatternDatabase of the current process
+_DATABASES = {}
+
+def pattern_database(goal_state, cache_dir=CACHE_DIR):
+    """
+    Returns the pattern database of goal_state, loading it from cache_dir
+    or building and saving it the first time
+    """
+    key = (goal_state.key(), goal_state.max_x, goal_state.max_y)
+    database = _DATABASES.get(key)
+    if database is not None:
+        return database
+    digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:16]
+    path = os.path.join(cache_dir, 'pdb_%s.bin' % digest)
+    if os.path.exists(path):
+        database = PatternDatabase.load(path, goal_state)
+    if database is None:
+        database = PatternDatabase.build(goal_state)
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, exist_ok=True)
+        database.save(path)
+    _DATABASES[key] = database
+    return database
@@ -12,12 +12,16 @@ class Piece:
         self.y += 1
     """
     Class representing the pieces of the Tutris World
+    The symbol and the shape are shared by all the pieces of a class, so
+    each instance only stores its position (x, y)
     """
+    __slots__ = ('x', 'y')
+    symbol = ' '
+    shape = ()
+
     def __init__(self, x=0, y=0):
         self.x = x 
         self.y = y
-        self.symbol = ' '
-        self.shape = []
 
     def occupied_positions(self):
         # Devuelve las posiciones absolutas ocupadas por la pieza
@@ -50,8 +54,57 @@ class Piece:
         for (x,y) in self.occupied_positions():
             board[y][x] = self.symbol
         return board
+
+    def mask(self, max_x, max_y):
+        """
+        Footprint of the piece as a bitboard of a max_x * max_y board (see
+        board_layout), or None if the anchor is too far from the board to
+        be represented.  The piece is inside the board iff the footprint
+        does not intersect the guard cells (mask & guard == 0).
+        """
+        stride, _, _ = board_layout(max_x, max_y)
+        if not (-BITBOARD_GUARD <= self.x <= max_x and -BITBOARD_GUARD <= self.y <= max_y):
+            return None
+        shape_mask = _SHAPE_MASKS.get((self.__class__, stride))
+        if shape_mask is None:
+            shape_mask = 0
+            for (dx, dy) in self.shape:
+                shape_mask |= 1 << (dy * stride + dx)
+            _SHAPE_MASKS[(self.__class__, stride)] = shape_mask
+        return shape_mask << ((self.y + BITBOARD_GUARD) * stride + self.x + BITBOARD_GUARD)
     
 
+#--------------------------------------------------------------------------------
+# Bitboards
+#
+# A board of max_x * max_y cells is stored in a Python int, one bit per cell,
+# row by row.  The board is surrounded by BITBOARD_GUARD guard columns and rows
+# (wider than any piece), so a piece that leaves the board sets a guard bit
+# instead of wrapping into the next row.  Python ints have arbitrary width, so
+# any board size works.
+
+BITBOARD_GUARD = 4
+
+# (piece class, stride) -> footprint of the piece anchored at bit 0
+_SHAPE_MASKS = {}
+# (max_x, max_y) -> (stride, mask of the board cells, mask of the guard cells)
+_LAYOUTS = {}
+
+def board_layout(max_x, max_y):
+    layout = _LAYOUTS.get((max_x, max_y))
+    if layout is None:
+        stride = max_x + 2 * BITBOARD_GUARD
+        height = max_y + 2 * BITBOARD_GUARD
+        row = ((1 << max_x) - 1) << BITBOARD_GUARD
+        inside = 0
+        for y in range(BITBOARD_GUARD, BITBOARD_GUARD + max_y):
+            inside |= row << (y * stride)
+        guard = ((1 << (stride * height)) - 1) & ~inside
+        layout = (stride, inside, guard)
+        _LAYOUTS[(max_x, max_y)] = layout
+    return layout
+
+
 class PieceBar(Piece):
     """
     Piece with the shape of a horizontal bar
@@ -60,11 +113,9 @@ class PieceBar(Piece):
     xx xx xx xx
 
     """
-    def __init__(self, x=0, y=0):
-        self.x = x 
-        self.y = y
-        self.symbol = '+'
-        self.shape = [(0,0), (1,0), (2,0), (3,0)]
+    __slots__ = ()
+    symbol = '+'
+    shape = ((0,0), (1,0), (2,0), (3,0))
 
     def copy(self):
         return PieceBar(self.x, self.y)
@@ -80,12 +131,10 @@ class PieceL(Piece):
           xx
           
     """
-    def __init__(self, x=0, y=0):
-        self.x = x 
-        self.y = y
-        self.symbol = '*'
-        self.shape = [(0,0), (1,0), (2,0), 
-                                    (2,1)]
+    __slots__ = ()
+    symbol = '*'
+    shape = ((0,0), (1,0), (2,0), 
+                           (2,1))
 
     def copy(self):
         return PieceL(self.x, self.y)
@@ -101,12 +150,10 @@ class PieceS(Piece):
        xx xx
 
     """
-    def __init__(self, x=0, y=0):
-        self.x = x 
-        self.y = y
-        self.symbol = '#'
-        self.shape = [(0,0), (1,0), 
-                             (1,1), (2,1)]
+    __slots__ = ()
+    symbol = '#'
+    shape = ((0,0), (1,0), 
+                    (1,1), (2,1))
 
     def copy(self):
         return PieceS(self.x, self.y)
@@ -122,12 +169,88 @@ class PieceSquare(Piece):
     xx xx
 
     """
-    def __init__(self, x=0, y=0):
-        self.x = x 
-        self.y = y
-        self.symbol = '%'
-        self.shape = [(0,0), (1,0), 
-                      (0,1), (1,1)]
+    __slots__ = ()
+    symbol = '%'
+    shape = ((0,0), (1,0), 
+             (0,1), (1,1))
 
     def copy(self):
         return PieceSquare(self.x, self.y)
+
+
+#--------------------------------------------------------------------------------
+# Precomputed geometry tables
+
+# Movements of the pieces and their displacement, in expansion order
+MOVEMENTS = (('LEFT', (-1, 0)), ('RIGHT', (1, 0)), ('DOWN', (0, 1)))
+
+class PieceTable:
+    """
+    Geometry of a piece class on a max_x * max_y board, precomputed for
+    every anchor position where the piece fits inside the board:
+       t.anchors          list of anchors (x, y) inside the board
+       t.cells[(x, y)]    cells occupied by the piece anchored at (x, y)
+       t.masks[(x, y)]    footprint bitboard of the piece (see board_layout)
+       t.moves[(x, y)]    dict movement -> (nx, ny, new_mask, enter_mask) for
+                          the movements that keep the piece inside the board;
+                          enter_mask holds only the cells newly entered
+       t.unmoves[(x, y)]  same as moves, but for the reversed movements: dict
+                          movement -> (px, py, prev_mask, enter_mask) where
+                          (px, py) is the anchor from which movement leads
+                          to (x, y) (RIGHT, LEFT and UP for LEFT, RIGHT and
+                          DOWN)
+
+    Tables are built once per (piece class, max_x, max_y) by piece_table.
+    """
+    __slots__ = ('piece_class', 'max_x', 'max_y', 'anchors', 'cells', 'masks',
+                 'moves', 'unmoves')
+
+    def __init__(self, piece_class, max_x, max_y):
+        self.piece_class = piece_class
+        self.max_x = max_x
+        self.max_y = max_y
+        self.anchors = []
+        self.cells = {}
+        self.masks = {}
+        self.moves = {}
+        self.unmoves = {}
+        width = max(dx for (dx, dy) in piece_class.shape) + 1
+        height = max(dy for (dx, dy) in piece_class.shape) + 1
+        for y in range(max_y - height + 1):
+            for x in range(max_x - width + 1):
+                piece = piece_class(x, y)
+                self.anchors.append((x, y))
+                self.cells[(x, y)] = tuple(piece.occupied_positions())
+                self.masks[(x, y)] = piece.mask(max_x, max_y)
+        for (x, y) in self.anchors:
+            moves = {}
+            for movement, (dx, dy) in MOVEMENTS:
+                new_mask = self.masks.get((x + dx, y + dy))
+                if new_mask is not None:
+                    moves[movement] = (x + dx, y + dy, new_mask,
+                                       new_mask & ~self.masks[(x, y)])
+            self.moves[(x, y)] = moves
+            unmoves = {}
+            for movement, (dx, dy) in MOVEMENTS:
+                prev_mask = self.masks.get((x - dx, y - dy))
+                if prev_mask is not None:
+                    unmoves[movement] = (x - dx, y - dy, prev_mask,
+                                         prev_mask & ~self.masks[(x, y)])
+            self.unmoves[(x, y)] = unmoves
+
+    def mask_at(self, x, y):
+        # Footprint at (x, y), also for anchors outside the board
+        m = self.masks.get((x, y))
+        if m is None:
+            m = self.piece_class(x, y).mask(self.max_x, self.max_y)
+        return m
+
+# (piece class, max_x, max_y) -> PieceTable
+_TABLES = {}
+
+def piece_table(piece_class, max_x, max_y):
+    table = _TABLES.get((piece_class, max_x, max_y))
+    if table is None:
+        table = PieceTable(piece_class, max_x, max_y)
+        _TABLES[(piece_class, max_x, max_y)] = table
+    return table
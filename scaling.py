@@ -0,0 +1,232 @@
+# Random Tutris instances and scaling benchmark of the search algorithms
+#------------------------------------------------------------------------
+
+from state import TutrisState
+from pieces import *
+from search import *
+from tutrisproblem import run_job
+import argparse, csv, json, multiprocessing, random, tracemalloc
+
+PIECE_CLASSES = [PieceBar, PieceL, PieceS, PieceSquare]
+
+#------------------------------------------------------------------------
+# INSTANCIAS ALEATORIAS
+
+def random_state(piece_classes, max_x, max_y, rng, attempts=1000):
+    """
+    Coloca las piezas de piece_classes (en ese orden) en posiciones
+    aleatorias validas del tablero.  Devuelve None si no lo consigue en
+    attempts intentos (tablero demasiado pequeño para las piezas).
+    """
+    for i in range(attempts):
+        pieces = []
+        occupied = 0
+        for piece_class in piece_classes:
+            table = piece_table(piece_class, max_x, max_y)
+            free = [a for a in table.anchors if not table.masks[a] & occupied]
+            if not free:
+                break
+            (x, y) = rng.choice(free)
+            pieces.append(piece_class(x, y))
+            occupied |= table.masks[(x, y)]
+        else:
+            state = TutrisState(pieces, max_x, max_y)
+            if state.is_valid():
+                return state
+    return None
+
+def random_instance(piece_classes, max_x, max_y, walk_length, rng):
+    """
+    Genera un par (estado inicial, estado objetivo) con solucion: el
+    objetivo es una colocacion aleatoria de las piezas, y el estado inicial
+    se obtiene deshaciendo walk_length movimientos aleatorios desde el
+    objetivo (previous_states), de modo que existe un camino de como mucho
+    walk_length pasos del inicial al objetivo.
+    """
+    goal_state = random_state(piece_classes, max_x, max_y, rng)
+    if goal_state is None:
+        return None
+    state = goal_state
+    for i in range(walk_length):
+        previous = state.previous_states()
+        if not previous:
+            break
+        state = rng.choice(previous)[0]
+    return (state, goal_state)
+
+def piece_mix(n, mix, rng):
+    # Clases de las n piezas: 'random' (mezcla aleatoria), 'cycle' (las cuatro
+    # clases por turnos) o el nombre de una clase (todas iguales)
+    if mix == 'random':
+        return [rng.choice(PIECE_CLASSES) for i in range(n)]
+    if mix == 'cycle':
+        return [PIECE_CLASSES[i % len(PIECE_CLASSES)] for i in range(n)]
+    return [dict((c.__name__, c) for c in PIECE_CLASSES)[mix]] * n
+
+#------------------------------------------------------------------------
+# ALGORITMOS
+
+def benchmark_algorithms(heuristics=(h1_manhattan, h4_pattern_database)):
+    # Todos los algoritmos de search; los informados con cada heuristica
+    algorithms = [
+        (breadth_first, "breadth_first", None),
+        (depth_first, "depth_first", None),
+        (uniform_cost, "uniform_cost", None),
+        (bidirectional, "bidirectional", None)
+    ]
+    for heuristic in heuristics:
+        for algorithm in (greedy, a_star, ida_star, anytime_a_star):
+            algorithms.append((algorithm, "%s(%s)" % (algorithm.__name__, heuristic.__name__), heuristic))
+    return algorithms
+
+def run_case(case):
+    """
+    Ejecuta un algoritmo sobre una instancia (en el proceso actual) y
+    devuelve la fila de resultados.  La memoria pico se mide con tracemalloc
+    si case['measure_memory'] es cierto.
+    """
+    job = (case['instance'], case['init_state'], case['goal_state'], case['algorithm'],
+           case['algorithm_name'], case['heuristic'],
+           {'timeout': case['time_cap'], 'max_expanded': case['node_cap']})
+    if case['measure_memory']:
+        tracemalloc.start()
+    try:
+        outcome = run_job(job, capture_output=True)
+        peak = tracemalloc.get_traced_memory()[1] if case['measure_memory'] else 0
+    finally:
+        if case['measure_memory']:
+            tracemalloc.stop()
+    node_cap = case['node_cap']
+    return {
+        'instance': case['instance'],
+        'max_x': case['init_state'].max_x,
+        'max_y': case['init_state'].max_y,
+        'cells': case['init_state'].max_x * case['init_state'].max_y,
+        'pieces': len(case['init_state'].piece_list),
+        'mix': case['mix'],
+        'algorithm': case['algorithm_name'],
+        'found': outcome['found'],
+        'steps': len(outcome['steps']),
+        'expanded': outcome['expanded'],
+        'generated': outcome['generated'],
+        'time': outcome['time'],
+        'peak_memory': peak,
+        'time_capped': outcome['timeout'],
+        # Busqueda cortada por el limite de nodos expandidos (o, en los
+        # algoritmos sin presupuesto, terminada tras superarlo)
+        'node_capped': (outcome['budget'] == 'expanded' or
+                        (node_cap is not None and outcome['expanded'] > node_cap))
+    }
+
+#------------------------------------------------------------------------
+# BENCHMARK DE ESCALADO
+
+def run_scaling_benchmark(sizes=((6, 6), (8, 8), (10, 10)), piece_counts=(2, 3, 4),
+                          mixes=('random',), instances=3, walk_length=30,
+                          time_cap=10.0, node_cap=200000, workers=0, seed=0,
+                          measure_memory=True, algorithms=None):
+    """
+    Genera instancias aleatorias con solucion para cada combinacion de
+    tamaño de tablero, numero de piezas y mezcla de piezas, y ejecuta
+    todos los algoritmos sobre ellas.  Cada ejecucion se corta al superar
+    time_cap segundos o node_cap nodos expandidos, y se marca como limitada.  Devuelve la lista de filas de resultados,
+    en un orden que no depende del numero de procesos (workers).
+    """
+    rng = random.Random(seed)
+    algorithms = algorithms or benchmark_algorithms()
+    cases = []
+    for (max_x, max_y) in sizes:
+        for n in piece_counts:
+            for mix in mixes:
+                for k in range(instances):
+                    instance = random_instance(piece_mix(n, mix, rng), max_x, max_y, walk_length, rng)
+                    if instance is None:
+                        continue
+                    init_state, goal_state = instance
+                    name = "%dx%d_%dp_%s_%d" % (max_x, max_y, n, mix, k)
+                    for algorithm, algorithm_name, heuristic in algorithms:
+                        cases.append({
+                            'instance': name, 'mix': mix,
+                            'init_state': init_state, 'goal_state': goal_state,
+                            'algorithm': algorithm, 'algorithm_name': algorithm_name,
+                            'heuristic': heuristic, 'time_cap': time_cap,
+                            'node_cap': node_cap, 'measure_memory': measure_memory
+                        })
+    if workers:
+        pool = multiprocessing.Pool(workers)
+        try:
+            rows = pool.map(run_case, cases, chunksize=1)
+        finally:
+            pool.terminate()
+            pool.join()
+    else:
+        rows = [run_case(case) for case in cases]
+    return rows
+
+def scaling_curves(rows):
+    """
+    Agrega las filas por (algoritmo, tamaño de tablero, numero de piezas):
+    medias de nodos expandidos, tiempo y memoria pico, y numero de
+    ejecuciones resueltas y limitadas.
+    """
+    groups = {}
+    for row in rows:
+        key = (row['algorithm'], row['max_x'], row['max_y'], row['pieces'])
+        groups.setdefault(key, []).append(row)
+    curves = []
+    for (algorithm, max_x, max_y, pieces), group in sorted(groups.items()):
+        n = len(group)
+        curves.append({
+            'algorithm': algorithm, 'max_x': max_x, 'max_y': max_y,
+            'cells': max_x * max_y, 'pieces': pieces, 'runs': n,
+            'solved': sum(1 for row in group if row['found']),
+            'capped': sum(1 for row in group if row['time_capped'] or row['node_capped']),
+            'mean_expanded': sum(row['expanded'] for row in group) / n,
+            'mean_time': sum(row['time'] for row in group) / n,
+            'mean_peak_memory': sum(row['peak_memory'] for row in group) / n
+        })
+    return curves
+
+def save_results(rows, prefix):
+    # Escribe prefix.csv (una fila por ejecucion) y prefix.json (filas y curvas)
+    if rows:
+        with open(prefix + '.csv', 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+    with open(prefix + '.json', 'w') as f:
+        json.dump({'runs': rows, 'curves': scaling_curves(rows)}, f, indent=1)
+
+#------------------------------------------------------------------------
+
+def parse_sizes(text):
+    # "6x6,8x8" -> [(6, 6), (8, 8)]
+    return [tuple(int(v) for v in size.split('x')) for size in text.split(',')]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de escalado de los algoritmos de busqueda")
+    parser.add_argument('--sizes', type=parse_sizes, default=[(6, 6), (8, 8), (10, 10)],
+                        help="tamaños de tablero, p.ej. 6x6,8x8,10x10")
+    parser.add_argument('--pieces', type=lambda t: [int(v) for v in t.split(',')], default=[2, 3, 4],
+                        help="numeros de piezas, p.ej. 2,3,4")
+    parser.add_argument('--mixes', type=lambda t: t.split(','), default=['random'],
+                        help="mezclas de piezas: random, cycle o un nombre de clase")
+    parser.add_argument('--instances', type=int, default=3, help="instancias por combinacion")
+    parser.add_argument('--walk', type=int, default=30, help="movimientos deshechos desde el objetivo")
+    parser.add_argument('--time-cap', type=float, default=10.0, help="segundos maximos por ejecucion")
+    parser.add_argument('--node-cap', type=int, default=200000, help="nodos expandidos maximos")
+    parser.add_argument('--workers', type=int, default=0, help="procesos en paralelo")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help="no medir la memoria pico")
+    parser.add_argument('--output', default='scaling_results', help="prefijo de los ficheros CSV/JSON")
+    args = parser.parse_args()
+
+    rows = run_scaling_benchmark(args.sizes, args.pieces, args.mixes, args.instances, args.walk,
+                                 args.time_cap, args.node_cap, args.workers, args.seed,
+                                 not args.no_memory)
+    save_results(rows, args.output)
+    for curve in scaling_curves(rows):
+        print("%-32s %3dx%-3d %d piezas: %d/%d resueltas, %10.1f expandidos, %8.3f s, %10.0f bytes" % (
+            curve['algorithm'], curve['max_x'], curve['max_y'], curve['pieces'], curve['solved'],
+            curve['runs'], curve['mean_expanded'], curve['mean_time'], curve['mean_peak_memory']))
+    print("Resultados guardados en %s.csv y %s.json" % (args.output, args.output))
@@ -1,4 +1,13 @@
 from datastructures import *
+from pieces import piece_table
+from patterndb import pattern_database
+from distancetable import distance_table
+from deadstates import unsolvable
+from state import action_cost
+from stepping import SearchProgress, run_steps
+import batchheuristics
+from collections import OrderedDict
+import multiprocessing, queue, time
 
 #----------------------------------------------------------------------
 
@@ -10,6 +19,8 @@ class Node:
     the node's state from the parent state, and the path cost g from
     the start node to this node.
     """
+    __slots__ = ('state', 'parent', 'action', 'g', 'h')
+
     def __init__(self, state, parent, action):
         self.state = state
         self.parent = parent
@@ -28,79 +39,214 @@ class Node:
         for (new_state, action) in self.state.next_states():
             new_node = Node(new_state, self, action)
             # Update path cost: each move has unit cost
-            new_node.g = self.g + 1
+            new_node.g = self.g + action_cost(action)
             successors.append(new_node)
         return successors
 
 #----------------------------------------------------------------------
 
-def uninformed_search(initial_state, goal_state, frontier):
+def uninformed_search(initial_state, goal_state, frontier, instrument=None, budget=None):
     """
     Parametros:
        initial_state: estado inicial de busqueda (objeto de clase TutrisState)
        goal_state: estado inicial de busqueda (objeto de clase TutrisState)
        frontier: estructura de datos para contener los estados de la frontera (objeto de clase
            contenida en el modulo DataStructures)
+       instrument: objeto Instrumentation opcional (ver modulo instrumentation)
+           en el que se acumulan tiempos y contadores de cada fase
+       budget: objeto SearchBudget opcional (ver modulo stepping) con los
+           limites de expandidos, memoria y tiempo de la busqueda
     """
+    return run_steps(uninformed_steps(initial_state, goal_state, frontier, 0, budget, instrument))
 
-    initial_node = Node(initial_state, None, None)
+def uninformed_steps(initial_state, goal_state, frontier, every=1, budget=None, instrument=None):
+    """
+    Forma paso a paso (generador) de uninformed_search: produce un
+    SearchProgress cada every expansiones (ninguno con every=0) y uno final
+    con done=True.  El llamador puede dejar de iterar en cualquier momento.
+    """
+    if _rejected(initial_state, goal_state):
+        yield SearchProgress(None, 0, 0, 0, True)
+        return
     expanded = 0
     generated = 0
-    frontier.insert(initial_node)
+    # Conjunto de claves (TutrisState.key()) de los estados explorados
     explored = set()
-    while not frontier.is_empty():
-        node = frontier.remove()
-        # Sin la comprobación da errores en ejecución
-        if node is None:
-            return (None, expanded, generated)
-        if node.state == goal_state:
-            return (node, expanded, generated)
-        explored.add(node.state)
-        expanded += 1
-        for child in node.expand():
-            # Evitar problemas de ejecucion
-            contents = getattr(frontier, 'contents', [])
-            in_frontier = any((n is not None and n.state == child.state) for n in contents)
-            if child.state not in explored and not in_frontier:
-                frontier.insert(child)
-                generated += 1
-    return (None, expanded, generated)
+    # Con acciones de coste distinto de 1 (macro acciones) un estado de la
+    # frontera puede alcanzarse despues con menor g
+    weighted = initial_state.macro is not None and isinstance(frontier, PriorityQueue)
+    expand = Node.expand
+    if instrument is not None:
+        frontier = instrument.frontier(frontier)
+        explored = instrument.explored_set()
+        expand = instrument.timed('expand', expand)
+        instrument.start()
+    if budget is not None:
+        budget.start()
+    try:
+        initial_node = Node(initial_state, None, None)
+        frontier.insert(initial_node)
+        while not frontier.is_empty():
+            node = frontier.remove()
+            # Sin la comprobación da errores en ejecución
+            if node is None:
+                break
+            if node.state == goal_state:
+                yield SearchProgress(node, expanded, generated, len(frontier), True, node)
+                return
+            if budget is not None and budget.exceeded(expanded):
+                yield SearchProgress(node, expanded, generated, len(frontier), True, None, budget.stopped)
+                return
+            explored.add(node.state.key())
+            expanded += 1
+            for child in expand(node):
+                # Pertenencia en O(1) mediante el indice de la frontera
+                child_key = child.state.key()
+                if child_key not in explored and not frontier.contains_key(child_key):
+                    frontier.insert(child)
+                    generated += 1
+                elif weighted and child_key not in explored and frontier.decrease_key(child):
+                    generated += 1
+            if every and expanded % every == 0:
+                yield SearchProgress(node, expanded, generated, len(frontier))
+        yield SearchProgress(None, expanded, generated, 0, True)
+    finally:
+        if budget is not None:
+            budget.stop()
+        if instrument is not None:
+            instrument.stop(expanded)
     
+def _rejected(initial_state, goal_state):
+    # Comprobacion previa de la poda de estados muertos (ver deadstates): si
+    # el estado inicial la usa, los pares sin solucion se descartan sin buscar
+    return initial_state.dead_check is not None and unsolvable(initial_state, goal_state)
+
 #----------------------------------------------------------------------
 # Test functions for uninformed search
 
-def breadth_first(initial_state, goal_state):
-    frontier = Queue()
-    frontier.push = frontier.insert
-    frontier.pop = frontier.remove
-    frontier.is_empty = frontier.is_empty
-    frontier.contains_state = lambda state: any (
-        node.state == state for node in frontier.contents if hasattr (frontier, 'contents')
-    )
-    return uninformed_search(initial_state, goal_state, frontier)
-
-def depth_first(initial_state, goal_state):
-    frontier = Stack()
-    frontier.push = frontier.insert
-    frontier.pop = frontier.remove
-    frontier.contains_state = lambda state: any(
-        node.state == state for node in frontier.contents if hasattr(frontier, 'contents')
-    )
-    return uninformed_search(initial_state, goal_state, frontier)
-
-def uniform_cost(initial_state, goal_state):
-    frontier = PriorityQueue(lambda node: node.g)
-    frontier.push = frontier.insert
-    frontier.pop = frontier.remove
-    frontier.contains_state = lambda state: any(
-        node.state == state for node in frontier.contents if hasattr(frontier, 'contents')
-    ) and frontier.contents
-    return uninformed_search(initial_state, goal_state, frontier)
+def node_key(node):
+    # Clave de indexacion de los nodos en las fronteras
+    return node.state.key()
+
+def breadth_first(initial_state, goal_state, instrument=None, budget=None):
+    return run_steps(breadth_first_steps(initial_state, goal_state, 0, budget, instrument))
+
+def breadth_first_steps(initial_state, goal_state, every=1, budget=None, instrument=None):
+    frontier = Queue(node_key)
+    return uninformed_steps(initial_state, goal_state, frontier, every, budget, instrument)
+
+def depth_first(initial_state, goal_state, instrument=None, budget=None):
+    return run_steps(depth_first_steps(initial_state, goal_state, 0, budget, instrument))
+
+def depth_first_steps(initial_state, goal_state, every=1, budget=None, instrument=None):
+    frontier = Stack(node_key)
+    return uninformed_steps(initial_state, goal_state, frontier, every, budget, instrument)
+
+def uniform_cost(initial_state, goal_state, instrument=None, budget=None):
+    return run_steps(uniform_cost_steps(initial_state, goal_state, 0, budget, instrument))
+
+def uniform_cost_steps(initial_state, goal_state, every=1, budget=None, instrument=None):
+    frontier = PriorityQueue(lambda node: node.g, node_key)
+    return uninformed_steps(initial_state, goal_state, frontier, every, budget, instrument)
 
 
 #----------------------------------------------------------------------
 
-def informed_search(initial_state, goal_state, frontier, heuristic):
+def bidirectional(initial_state, goal_state, budget=None):
+    """
+    Busqueda bidireccional en anchura: una frontera avanza desde el estado
+    inicial (next_states) y otra retrocede desde el objetivo con los
+    movimientos invertidos (previous_states).  Se expande cada vez un nivel
+    completo de la frontera mas pequena; cuando un nivel alcanza estados
+    visitados por la otra busqueda se elige el punto de encuentro con menor
+    coste total, lo que garantiza una solucion optima.
+    Devuelve (nodo solucion, expandidos, generados) como el resto de
+    algoritmos; el camino del nodo solucion va del estado inicial al objetivo.
+    """
+    return run_steps(bidirectional_steps(initial_state, goal_state, 0, budget))
+
+def bidirectional_steps(initial_state, goal_state, every=1, budget=None):
+    # Forma paso a paso de bidirectional (ver uninformed_steps); la frontera
+    # de los informes son los nodos de ambos niveles pendientes de expandir
+    if _rejected(initial_state, goal_state):
+        yield SearchProgress(None, 0, 0, 0, True)
+        return
+    if initial_state == goal_state:
+        node = Node(initial_state, None, None)
+        yield SearchProgress(node, 0, 0, 0, True, node)
+        return
+    expanded = 0
+    generated = 0
+    # Nodos visitados (explorados o en frontera) de cada busqueda por clave
+    forward = {initial_state.key(): Node(initial_state, None, None)}
+    backward = {goal_state.key(): Node(goal_state, None, None)}
+    forward_layer = list(forward.values())
+    backward_layer = list(backward.values())
+    if budget is not None:
+        budget.start()
+    try:
+        while forward_layer and backward_layer:
+            # Expandir el nivel mas pequeno
+            is_forward = len(forward_layer) <= len(backward_layer)
+            if is_forward:
+                layer, visited, other, waiting = forward_layer, forward, backward, len(backward_layer)
+            else:
+                layer, visited, other, waiting = backward_layer, backward, forward, len(forward_layer)
+            next_layer = []
+            best = None
+            for i, node in enumerate(layer):
+                if budget is not None and budget.exceeded(expanded):
+                    yield SearchProgress(node, expanded, generated, len(layer) - i + len(next_layer) + waiting,
+                                         True, None, budget.stopped)
+                    return
+                expanded += 1
+                children = node.state.next_states() if is_forward else node.state.previous_states()
+                for (state, action) in children:
+                    key = state.key()
+                    if key in visited:
+                        continue
+                    child = Node(state, node, action)
+                    child.g = node.g + action_cost(action)
+                    visited[key] = child
+                    next_layer.append(child)
+                    generated += 1
+                    meeting = other.get(key)
+                    if meeting is not None and (best is None or child.g + meeting.g < best[0].g + best[1].g):
+                        best = (child, meeting)
+                if every and expanded % every == 0:
+                    yield SearchProgress(node, expanded, generated, len(layer) - i - 1 + len(next_layer) + waiting)
+            if best is not None:
+                if is_forward:
+                    solution = _join_paths(best[0], best[1])
+                else:
+                    solution = _join_paths(best[1], best[0])
+                yield SearchProgress(solution, expanded, generated, len(next_layer) + waiting, True, solution)
+                return
+            if is_forward:
+                forward_layer = next_layer
+            else:
+                backward_layer = next_layer
+        yield SearchProgress(None, expanded, generated, 0, True)
+    finally:
+        if budget is not None:
+            budget.stop()
+
+def _join_paths(forward_node, backward_node):
+    # Une el camino hacia delante que termina en forward_node con el camino
+    # hacia atras (hasta el objetivo) que empieza en backward_node, ambos
+    # sobre el mismo estado.  Las acciones de la busqueda hacia atras ya son
+    # las acciones hacia delante que llevan de cada estado a su padre
+    node = forward_node
+    while backward_node.parent is not None:
+        next_node = Node(backward_node.parent.state, node, backward_node.action)
+        next_node.g = node.g + action_cost(backward_node.action)
+        node = next_node
+        backward_node = backward_node.parent
+    return node
+
+#----------------------------------------------------------------------
+
+def informed_search(initial_state, goal_state, frontier, heuristic, instrument=None, budget=None):
     """
     Parametros:
        initial_state: estado inicial de busqueda (objeto de clase TutrisState)
@@ -110,46 +256,620 @@ def informed_search(initial_state, goal_state, frontier, heuristic):
        heuristic: funcion heuristica utilizada para guiar el proceso de busqueda. La
            funcion recibe dos parametros (estado actual y estado objetivo) y devuelve
            una estimacion de coste entre ambos estados
+       instrument: objeto Instrumentation opcional (ver uninformed_search)
+       budget: objeto SearchBudget opcional (ver uninformed_search)
     """
+    return run_steps(informed_steps(initial_state, goal_state, frontier, heuristic, 0, budget, instrument))
 
-    initial_node = Node(initial_state, None, None)
-    initial_node.h = heuristic(initial_state, goal_state)
+def informed_steps(initial_state, goal_state, frontier, heuristic, every=1, budget=None, instrument=None):
+    # Forma paso a paso de informed_search (ver uninformed_steps)
+    if _rejected(initial_state, goal_state):
+        yield SearchProgress(None, 0, 0, 0, True)
+        return
     expanded = 0
     generated = 0
-    frontier.push(initial_node)
     explored = set()
-    while not frontier.is_empty():
-        node = frontier.pop()
-        # Sin la comprobación da errores en ejecución
-        if node is None:
-            return (None, expanded, generated)
-        if node.state == goal_state:
-            return (node, expanded, generated)
-        explored.add(node.state)
-        expanded += 1
-        for child in node.expand():
-            child.h = heuristic(child.state, goal_state)
-            if (child.state not in explored) and (not frontier.contains_state(child.state)):
-                frontier.push(child)
-                generated += 1
-    return (None, expanded, generated)
+    expand = Node.expand
+    # Con forma por lotes (ver BATCH_HEURISTICS) la heuristica de los hijos
+    # de cada expansion se calcula en una sola llamada si son al menos
+    # BATCH_MIN_SIZE
+    batch = batch_form(heuristic)
+    if instrument is not None:
+        frontier = instrument.frontier(frontier)
+        explored = instrument.explored_set()
+        expand = instrument.timed('expand', expand)
+        heuristic = instrument.timed('heuristic', heuristic)
+        if batch is not None:
+            batch = instrument.timed('heuristic', batch)
+        instrument.start()
+    if budget is not None:
+        budget.start()
+    try:
+        initial_node = Node(initial_state, None, None)
+        initial_node.h = heuristic(initial_state, goal_state)
+        frontier.push(initial_node)
+        while not frontier.is_empty():
+            node = frontier.pop()
+            # Sin la comprobación da errores en ejecución
+            if node is None:
+                break
+            if node.state == goal_state:
+                yield SearchProgress(node, expanded, generated, len(frontier), True, node)
+                return
+            if budget is not None and budget.exceeded(expanded):
+                yield SearchProgress(node, expanded, generated, len(frontier), True, None, budget.stopped)
+                return
+            explored.add(node.state.key())
+            expanded += 1
+            children = []
+            unscored = []
+            for child in expand(node):
+                child_key = child.state.key()
+                # Los hijos ya explorados se descartan sin evaluar la heuristica
+                if child_key in explored:
+                    continue
+                # Si el estado ya esta en la frontera se reutiliza su h
+                queued = frontier.get(child_key)
+                if queued is not None:
+                    child.h = queued.h
+                elif batch is None:
+                    child.h = heuristic(child.state, goal_state)
+                else:
+                    unscored.append(child)
+                children.append(child)
+            if unscored:
+                if len(unscored) >= BATCH_MIN_SIZE:
+                    values = batch([child.state for child in unscored], goal_state)
+                else:
+                    values = [heuristic(child.state, goal_state) for child in unscored]
+                for child, value in zip(unscored, values):
+                    child.h = value
+            for child in children:
+                # decrease_key inserta el hijo o sustituye al nodo de la frontera
+                # con el mismo estado si el hijo tiene menor coste
+                if frontier.decrease_key(child):
+                    generated += 1
+            if every and expanded % every == 0:
+                yield SearchProgress(node, expanded, generated, len(frontier))
+        yield SearchProgress(None, expanded, generated, 0, True)
+    finally:
+        if budget is not None:
+            budget.stop()
+        if instrument is not None:
+            instrument.stop(expanded)
     
 #----------------------------------------------------------------------
 # Test functions for informed search
 
-def greedy(initial_state, goal_state, heuristic):
-    frontier = PriorityQueue(lambda node: node.h)
-    frontier.push = frontier.insert
-    frontier.pop = frontier.remove
-    frontier.contains_state = lambda state: frontier.contains(Node(state, None, None))
-    return informed_search(initial_state, goal_state, frontier, heuristic)
+def greedy(initial_state, goal_state, heuristic, instrument=None, budget=None):
+    return run_steps(greedy_steps(initial_state, goal_state, heuristic, 0, budget, instrument))
+
+def greedy_steps(initial_state, goal_state, heuristic, every=1, budget=None, instrument=None):
+    frontier = PriorityQueue(lambda node: node.h, node_key)
+    return informed_steps(initial_state, goal_state, frontier, heuristic, every, budget, instrument)
+
+def a_star(initial_state, goal_state, heuristic, instrument=None, budget=None):
+    return run_steps(a_star_steps(initial_state, goal_state, heuristic, 0, budget, instrument))
+
+def a_star_steps(initial_state, goal_state, heuristic, every=1, budget=None, instrument=None):
+    # Entre nodos con igual f se prefiere el de mayor g (mas profundo)
+    frontier = PriorityQueue(lambda node: node.g + node.h, node_key,
+                             tiebreak=lambda node: -node.g)
+    return informed_steps(initial_state, goal_state, frontier, heuristic, every, budget, instrument)
+
+def ida_star(initial_state, goal_state, heuristic, table_size=10000, stats=None, budget=None):
+    """
+    IDA*: busqueda en profundidad iterativa sobre f = g + h.  Cada iteracion
+    poda los nodos con f mayor que el umbral, y el umbral de la siguiente
+    iteracion es el menor f podado.  La memoria es lineal en la profundidad
+    de la solucion: solo se guarda el camino actual y los hijos pendientes
+    de cada nodo del camino.
+    Parametros:
+       table_size: numero maximo de entradas de la tabla de transposicion
+           (clave del estado -> menor g con el que se ha alcanzado en la
+           iteracion actual), que evita reexpandir estados alcanzados por
+           caminos no mejores.  Con 0 no se usa tabla
+       stats: diccionario opcional en el que se guarda, en la clave
+           'iterations', la lista de (umbral, expandidos acumulados) de
+           cada iteracion
+       budget: objeto SearchBudget opcional (ver uninformed_search)
+    Devuelve (nodo solucion, expandidos, generados) como el resto de
+    algoritmos.
+    """
+    return run_steps(ida_star_steps(initial_state, goal_state, heuristic, 0, budget, table_size, stats))
+
+def ida_star_steps(initial_state, goal_state, heuristic, every=1, budget=None, table_size=10000, stats=None):
+    # Forma paso a paso de ida_star (ver uninformed_steps); la frontera de
+    # los informes es la profundidad de la pila
+    if _rejected(initial_state, goal_state):
+        yield SearchProgress(None, 0, 0, 0, True)
+        return
+    root = Node(initial_state, None, None)
+    root.h = heuristic(initial_state, goal_state)
+    threshold = root.h
+    counters = [0, 0]
+    iterations = []
+    if stats is not None:
+        stats['iterations'] = iterations
+    if budget is not None:
+        budget.start()
+    try:
+        while True:
+            next_threshold = yield from _ida_iteration(
+                root, goal_state, heuristic, threshold, table_size, counters, every, budget)
+            iterations.append((threshold, counters[0]))
+            if next_threshold is None:
+                return
+            if next_threshold == float('inf'):
+                yield SearchProgress(None, counters[0], counters[1], 0, True)
+                return
+            threshold = next_threshold
+    finally:
+        if budget is not None:
+            budget.stop()
+
+def _ida_iteration(root, goal_state, heuristic, threshold, table_size, counters, every, budget):
+    # Una iteracion de IDA* (profundidad con pila explicita).  Acumula
+    # expandidos y generados en counters y devuelve el siguiente umbral, o
+    # None si la busqueda ha terminado (tras producir el informe final)
+    next_threshold = float('inf')
+    expanded, generated = counters
+    table = {}
+    on_path = {root.state.key()}
+    # Pila de [nodo, iterador sobre sus hijos o None si aun no se ha expandido]
+    stack = [[root, None]]
+    try:
+        while stack:
+            entry = stack[-1]
+            node = entry[0]
+            if entry[1] is None:
+                f = node.g + node.h
+                if f > threshold:
+                    next_threshold = min(next_threshold, f)
+                    stack.pop()
+                    on_path.discard(node.state.key())
+                    continue
+                if node.state == goal_state:
+                    yield SearchProgress(node, expanded, generated, len(stack), True, node)
+                    return None
+                if budget is not None and budget.exceeded(expanded):
+                    yield SearchProgress(node, expanded, generated, len(stack), True, None, budget.stopped)
+                    return None
+                expanded += 1
+                children = []
+                for child in node.expand():
+                    key = child.state.key()
+                    # Evitar ciclos en el camino actual
+                    if key in on_path:
+                        continue
+                    if table_size:
+                        best_g = table.get(key)
+                        if best_g is not None and best_g <= child.g:
+                            continue
+                        if best_g is not None or len(table) < table_size:
+                            table[key] = child.g
+                    child.h = heuristic(child.state, goal_state)
+                    generated += 1
+                    children.append(child)
+                # Explorar primero los hijos con menor f
+                children.sort(key=lambda child: child.g + child.h)
+                entry[1] = iter(children)
+                if every and expanded % every == 0:
+                    yield SearchProgress(node, expanded, generated, len(stack))
+            child = next(entry[1], None)
+            if child is None:
+                stack.pop()
+                on_path.discard(node.state.key())
+            else:
+                on_path.add(child.state.key())
+                stack.append([child, None])
+        return next_threshold
+    finally:
+        counters[0], counters[1] = expanded, generated
+
+#----------------------------------------------------------------------
+# Anytime weighted A*
+
+# Pesos de las sucesivas busquedas de anytime_a_star
+ANYTIME_WEIGHTS = (5, 3, 2, 1.5, 1.25, 1)
+
+def anytime_a_star(initial_state, goal_state, heuristic, weights=ANYTIME_WEIGHTS, stats=None, budget=None):
+    """
+    A* ponderado anytime (ARA*): una sucesion de busquedas A* con
+    f = g + w*h y pesos w decrecientes.  La primera, con el peso mas alto,
+    encuentra rapido una solucion; cada busqueda siguiente reutiliza los
+    nodos generados por las anteriores (valores g y h, frontera y nodos
+    explorados cuyo g ha mejorado) y solo expande lo necesario para mejorar
+    la solucion con el nuevo peso.  Termina al agotar los pesos, al probar
+    que la solucion es optima o al superar los limites de budget (por
+    ejemplo SearchBudget(time_limit=...)): en ese caso devuelve la mejor
+    solucion encontrada hasta entonces.
+    Parametros:
+       weights: pesos de las sucesivas busquedas (el ultimo deberia ser 1)
+       stats: diccionario opcional en el que se guarda, en la clave
+           'solutions', la lista de (segundos desde el inicio, pasos, cota,
+           peso, expandidos acumulados) de cada solucion mejorada, y en la
+           clave 'bound' la ultima cota.  La cota acota el cociente entre el
+           coste de la solucion y el optimo (1: optima); solo es valida con
+           heuristicas admisibles
+       budget: objeto SearchBudget opcional (ver uninformed_search)
+    Devuelve (nodo solucion, expandidos, generados) como el resto de
+    algoritmos.
+    """
+    return run_steps(anytime_a_star_steps(initial_state, goal_state, heuristic, 0, budget, weights, stats))
+
+def anytime_a_star_steps(initial_state, goal_state, heuristic, every=1, budget=None,
+                         weights=ANYTIME_WEIGHTS, stats=None):
+    # Forma paso a paso de anytime_a_star (ver uninformed_steps); ademas
+    # produce un informe con la nueva solucion cada vez que esta mejora
+    if _rejected(initial_state, goal_state):
+        yield SearchProgress(None, 0, 0, 0, True)
+        return
+    start_time = time.perf_counter()
+    expanded = 0
+    generated = 0
+    solutions = []
+    if stats is not None:
+        stats['solutions'] = solutions
+        stats['bound'] = float('inf')
+    goal_key = goal_state.key()
+    root = Node(initial_state, None, None)
+    root.h = heuristic(initial_state, goal_state)
+    # Nodo con menor g de cada estado generado (por clave)
+    best = {initial_state.key(): root}
+    # Nodos pendientes para la siguiente busqueda
+    open_nodes = [root]
+    incumbent = None
+    if budget is not None:
+        budget.start()
+    try:
+        for weight in weights:
+            frontier = PriorityQueue(lambda node, w=weight: node.g + w * node.h, node_key,
+                                     tiebreak=lambda node: -node.g)
+            for node in open_nodes:
+                frontier.insert(node)
+            closed = set()
+            # Explorados en esta busqueda cuyo g ha mejorado despues
+            inconsistent = []
+            while not frontier.is_empty():
+                node = frontier.pop()
+                incumbent = best.get(goal_key)
+                # Ningun nodo de la frontera puede mejorar la solucion con este peso
+                if incumbent is not None and node.g + weight * node.h >= incumbent.g:
+                    frontier.insert(node)
+                    break
+                if budget is not None and budget.exceeded(expanded):
+                    yield SearchProgress(node, expanded, generated, len(frontier), True, incumbent, budget.stopped)
+                    return
+                closed.add(node.state.key())
+                expanded += 1
+                for child in node.expand():
+                    child_key = child.state.key()
+                    known = best.get(child_key)
+                    if known is not None:
+                        if known.g <= child.g:
+                            continue
+                        child.h = known.h
+                    else:
+                        child.h = heuristic(child.state, goal_state)
+                    best[child_key] = child
+                    generated += 1
+                    if child_key in closed:
+                        inconsistent.append(child)
+                    else:
+                        frontier.decrease_key(child)
+                if every and expanded % every == 0:
+                    yield SearchProgress(node, expanded, generated, len(frontier), False, best.get(goal_key))
+            incumbent = best.get(goal_key)
+            open_nodes = frontier.elements() + [node for node in inconsistent
+                                                if best[node.state.key()] is node]
+            if incumbent is None:
+                # Sin solucion con ningun peso: la frontera se ha vaciado
+                break
+            # Cota de suboptimalidad: el optimo es al menos el menor g + h pendiente
+            lower = min([node.g + node.h for node in open_nodes] or [float('inf')])
+            bound = max(1.0, min(weight, incumbent.g / lower)) if lower > 0 else weight
+            if not solutions or incumbent.g < solutions[-1][1] or bound < solutions[-1][2]:
+                solutions.append((time.perf_counter() - start_time, incumbent.g, bound, weight, expanded))
+                yield SearchProgress(incumbent, expanded, generated, len(open_nodes), False, incumbent)
+            if stats is not None:
+                stats['bound'] = bound
+            if bound <= 1.0:
+                break
+        yield SearchProgress(incumbent, expanded, generated, 0, True, incumbent)
+    finally:
+        if budget is not None:
+            budget.stop()
+
+#----------------------------------------------------------------------
+# HDA*: A* distribuido por hash entre procesos
+
+# Hijos por mensaje entre procesos de hda_star
+HDA_BATCH_SIZE = 64
+
+def hda_owner(key, workers):
+    # Proceso propietario de un estado.  Se usa el hash de las coordenadas
+    # (el hash de los enteros es el mismo en todos los procesos; el de los
+    # nombres de clase no)
+    return hash(key[1:]) % workers
 
-def a_star(initial_state, goal_state, heuristic):
-    frontier = PriorityQueue(lambda node: node.g + node.h)
-    frontier.push = frontier.insert
-    frontier.pop = frontier.remove
-    frontier.contains_state = lambda state: frontier.contains(Node(state, None, None))
-    return informed_search(initial_state, goal_state, frontier, heuristic)
+def hda_star(initial_state, goal_state, heuristic, workers=2, batch_size=HDA_BATCH_SIZE, stats=None):
+    """
+    HDA* (Hash Distributed A*): A* repartido entre workers procesos.  Cada
+    estado pertenece al proceso hda_owner(clave); cada proceso tiene su
+    propia frontera y sus propios valores g, expande sus estados y envia
+    los hijos a sus propietarios en lotes de batch_size.  Un estado puede
+    volver a abrirse si llega con menor g.
+
+    Cuando un proceso saca el objetivo de su frontera, su coste se difunde
+    como cota a todos los procesos, que dejan de expandir nodos con
+    f >= cota.  La busqueda termina cuando ningun proceso tiene trabajo y
+    no quedan mensajes en transito (deteccion por doble recuento de
+    mensajes enviados y recibidos en dos rondas consecutivas); con una
+    heuristica admisible la cota final es el coste optimo.  El camino se
+    reconstruye preguntando a cada propietario por el padre de su estado.
+    Parametros:
+       stats: diccionario opcional en el que se guardan, por proceso, los
+           expandidos ('expanded_per_worker') y el numero de lotes enviados
+           ('batches')
+    Devuelve (nodo solucion, expandidos, generados) como el resto de
+    algoritmos, sumando los de todos los procesos.
+    """
+    if _rejected(initial_state, goal_state):
+        return (None, 0, 0)
+    inboxes = [multiprocessing.Queue() for i in range(workers)]
+    control = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=_hda_worker, daemon=True,
+                                         args=(i, workers, inboxes, control, initial_state, goal_state, heuristic,
+                                               batch_size))
+                 for i in range(workers)]
+    for process in processes:
+        process.start()
+    try:
+        root_key = initial_state.key()
+        inboxes[hda_owner(root_key, workers)].put(('nodes', [(root_key, 0, None, None)]))
+        incumbent = _hda_coordinate(inboxes, control, workers)
+        solution = None
+        if incumbent is not None:
+            solution = _hda_path(inboxes, control, goal_state, workers)
+        for inbox in inboxes:
+            inbox.put(('stop',))
+        expanded = generated = 0
+        expanded_per_worker = [0] * workers
+        batches = 0
+        for i in range(workers):
+            kind, index, worker_expanded, worker_generated, worker_batches = control.get()
+            expanded_per_worker[index] = worker_expanded
+            expanded += worker_expanded
+            generated += worker_generated
+            batches += worker_batches
+        if stats is not None:
+            stats['expanded_per_worker'] = expanded_per_worker
+            stats['batches'] = batches
+        return (solution, expanded, generated)
+    finally:
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+def _hda_coordinate(inboxes, control, workers):
+    # Recibe las soluciones y los informes de los procesos hasta detectar la
+    # terminacion.  Devuelve el coste de la mejor solucion o None
+    incumbent = None
+    # Ultimo informe de cada proceso: (inactivo, enviados, recibidos)
+    reports = {}
+    # El lote inicial lo envia este proceso
+    seeded = 1
+    wave = 0
+    replies = None
+    previous = None
+    while True:
+        message = control.get()
+        kind = message[0]
+        if kind == 'solution':
+            cost = message[2]
+            if incumbent is None or cost < incumbent:
+                incumbent = cost
+                for inbox in inboxes:
+                    inbox.put(('bound', cost))
+            continue
+        if kind == 'idle':
+            reports[message[1]] = (True, message[2], message[3])
+        elif kind == 'probe' and message[1] == wave and replies is not None:
+            replies[message[2]] = (message[3], message[4], message[5])
+            reports[message[2]] = replies[message[2]]
+            if len(replies) < workers:
+                continue
+            counts = [replies[i] for i in range(workers)]
+            replies = None
+            if _hda_quiet(counts, seeded) and counts == previous:
+                return incumbent
+            previous = counts if _hda_quiet(counts, seeded) else None
+        # Nueva ronda de recuento si todos parecen inactivos y sin mensajes en transito
+        if replies is None and len(reports) == workers and _hda_quiet(list(reports.values()), seeded):
+            wave += 1
+            replies = {}
+            for inbox in inboxes:
+                inbox.put(('probe', wave))
+
+def _hda_quiet(counts, seeded):
+    # Todos los procesos inactivos y tantos lotes recibidos como enviados
+    return (all(idle for (idle, sent, received) in counts) and
+            sum(sent for (idle, sent, received) in counts) + seeded ==
+            sum(received for (idle, sent, received) in counts))
+
+def _hda_path(inboxes, control, goal_state, workers):
+    # Reconstruye el camino desde el objetivo preguntando por los padres
+    classes = dict((p.__class__.__name__, p.__class__) for p in goal_state.piece_list)
+    chain = []
+    key = goal_state.key()
+    while key is not None:
+        inboxes[hda_owner(key, workers)].put(('parent', key))
+        kind, parent_key, action = control.get()
+        chain.append((key, action))
+        key = parent_key
+    node = None
+    for (key, action) in reversed(chain):
+        child = Node(_state_from_key(key, classes, goal_state), node, action)
+        child.g = node.g + action_cost(action) if node is not None else 0
+        node = child
+    return node
+
+def _state_from_key(key, classes, template):
+    # Estado de una clave (nombres de clase, x0, y0, x1, y1, ...), con el
+    # tablero y los modos de expansion del estado template
+    pieces = [classes[name](key[1 + 2 * i], key[2 + 2 * i]) for i, name in enumerate(key[0])]
+    state = type(template)(pieces, template.max_x, template.max_y, template.bitboard, template.grid,
+                           template.partial_order, template.dead_check, template.macro)
+    state._key = key
+    return state
+
+def _hda_worker(index, workers, inboxes, control, initial_state, goal_state, heuristic, batch_size):
+    # Bucle de un proceso de hda_star
+    inbox = inboxes[index]
+    classes = dict((p.__class__.__name__, p.__class__) for p in goal_state.piece_list)
+    goal_key = goal_state.key()
+    frontier = PriorityQueue(lambda node: node.g + node.h, node_key, tiebreak=lambda node: -node.g)
+    # Clave -> (g, clave del padre, accion) del mejor camino conocido
+    best = {}
+    outboxes = [[] for i in range(workers)]
+    incumbent = float('inf')
+    expanded = generated = sent = received = 0
+    # Sin trabajo: frontera vacia o sin nodos con f menor que la cota
+    blocked = False
+    reported = False
+
+    def receive(key, state, g, parent_key, action):
+        # Los hijos de otros procesos llegan como claves (state None)
+        nonlocal blocked
+        known = best.get(key)
+        if known is not None and known[0] <= g:
+            return
+        best[key] = (g, parent_key, action)
+        if state is None:
+            state = _state_from_key(key, classes, initial_state)
+        node = Node(state, None, action)
+        node.g = g
+        node.h = heuristic(state, goal_state)
+        frontier.decrease_key(node)
+        blocked = False
+
+    def flush():
+        nonlocal sent
+        for owner in range(workers):
+            if outboxes[owner]:
+                inboxes[owner].put(('nodes', outboxes[owner]))
+                outboxes[owner] = []
+                sent += 1
+
+    while True:
+        idle = blocked or frontier.is_empty()
+        if idle:
+            flush()
+            if not reported:
+                control.put(('idle', index, sent, received))
+                reported = True
+            message = inbox.get()
+        else:
+            try:
+                message = inbox.get_nowait()
+            except queue.Empty:
+                message = None
+        if message is not None:
+            kind = message[0]
+            if kind == 'nodes':
+                received += 1
+                reported = False
+                for (key, g, parent_key, action) in message[1]:
+                    receive(key, None, g, parent_key, action)
+            elif kind == 'bound':
+                incumbent = min(incumbent, message[1])
+            elif kind == 'probe':
+                flush()
+                control.put(('probe', message[1], index, blocked or frontier.is_empty(), sent, received))
+            elif kind == 'parent':
+                g, parent_key, action = best[message[1]]
+                control.put(('parent', parent_key, action))
+            elif kind == 'stop':
+                control.put(('stats', index, expanded, generated, sent))
+                return
+            continue
+        node = frontier.pop()
+        if node.g + node.h >= incumbent:
+            # La frontera esta ordenada por f: nada mejora la cota
+            frontier.insert(node)
+            blocked = True
+            continue
+        key = node.state.key()
+        if key == goal_key:
+            incumbent = node.g
+            control.put(('solution', index, node.g))
+            continue
+        expanded += 1
+        for (state, action) in node.state.next_states():
+            child_key = state.key()
+            generated += 1
+            owner = hda_owner(child_key, workers)
+            if owner == index:
+                receive(child_key, state, node.g + action_cost(action), key, action)
+            else:
+                outboxes[owner].append((child_key, node.g + action_cost(action), key, action))
+                if len(outboxes[owner]) >= batch_size:
+                    inboxes[owner].put(('nodes', outboxes[owner]))
+                    outboxes[owner] = []
+                    sent += 1
+
+#----------------------------------------------------------------------
+# Tabla de distancias
+
+def distance_table_path(initial_state, goal_state):
+    """
+    Solucion optima sin busqueda: sigue la tabla de distancias exactas del
+    objetivo (ver distancetable), que se calcula una vez por objetivo y
+    tamaño de tablero y se guarda en disco.  Devuelve (nodo solucion,
+    expandidos, generados) como el resto de algoritmos; los expandidos son
+    los estados del camino cuyos sucesores se han consultado.
+    """
+    path = distance_table(goal_state).optimal_path(initial_state)
+    if path is None:
+        return (None, 0, 0)
+    node = Node(initial_state, None, None)
+    for (state, action) in path:
+        child = Node(state, node, action)
+        child.g = node.g + 1
+        node = child
+    return (node, len(path), len(path))
+
+#----------------------------------------------------------------------
+# Stepping API: forma generadora de cada algoritmo
+
+STEPPERS = {
+    breadth_first: breadth_first_steps,
+    depth_first: depth_first_steps,
+    uniform_cost: uniform_cost_steps,
+    bidirectional: bidirectional_steps,
+    greedy: greedy_steps,
+    a_star: a_star_steps,
+    ida_star: ida_star_steps,
+    anytime_a_star: anytime_a_star_steps
+}
+
+def iter_search(algorithm, initial_state, goal_state, heuristic=None, every=1, budget=None):
+    """
+    Ejecuta algorithm (una de las funciones de STEPPERS) paso a paso:
+    devuelve un generador de SearchProgress, uno cada every expansiones y
+    uno final con done=True, solution y stopped.  Dejar de iterar detiene
+    la busqueda.
+    Ejemplo:
+       for progress in iter_search(depth_first, init, goal, every=1000,
+                                   budget=SearchBudget(time_limit=10)):
+           print(progress)
+    """
+    steps = STEPPERS[algorithm]
+    if heuristic is None:
+        return steps(initial_state, goal_state, every, budget)
+    return steps(initial_state, goal_state, heuristic, every, budget)
 
 #---------------------------------------------------------------------
 # Heuristic functions
@@ -169,10 +889,13 @@ def h1_manhattan(current_state, goal_state):
         total_distance += distance
     return total_distance
 
+# Pesos de h2_weighted_manhattan por tipo de pieza
+PIECE_WEIGHTS = {'PieceBar': 2.0, 'PieceL': 1.75, 'PieceS': 1.5, 'PieceSquare': 1.25}
+
 def h2_weighted_manhattan(current_state, goal_state):
     # Manhattan + Importancia a piezas grandes 
     total_distance = 0
-    weights = {'PieceBar': 2.0, 'PieceL': 1.75, 'PieceS': 1.5, 'PieceSquare': 1.25}
+    weights = PIECE_WEIGHTS
     for i in range(len(current_state.piece_list)):
         current_piece = current_state.piece_list[i]
         goal_piece = goal_state.piece_list[i]
@@ -188,24 +911,28 @@ def h3_blocking_pieces(current_state, goal_state):
     Heurística 3: Cuenta piezas que están en el camino de otras
     """
     blocking_count = 0
-    current_positions = set()
+    max_x, max_y = current_state.max_x, current_state.max_y
     
-    # Obtener todas las posiciones ocupadas en estado actual
-    for piece in current_state.piece_list:
-        current_positions.update(piece.occupied_positions())
+    # Mascara con todas las posiciones ocupadas en estado actual
+    current_positions = current_state.occupancy()
+    if current_positions is None:
+        # Estado no valido (piezas solapadas o fuera del tablero)
+        current_positions = 0
+        for piece in current_state.piece_list:
+            current_positions |= piece_table(piece.__class__, max_x, max_y).mask_at(piece.x, piece.y) or 0
     
     # Para cada pieza, verificar si su camino al objetivo está bloqueado
     for i in range(len(current_state.piece_list)):
         current_piece = current_state.piece_list[i]
         goal_piece = goal_state.piece_list[i]
+        table = piece_table(current_piece.__class__, max_x, max_y)
         
         # Si la pieza necesita moverse horizontalmente
         if current_piece.x != goal_piece.x:
             # Verificar si hay piezas en el camino horizontal
             step_x = 1 if goal_piece.x > current_piece.x else -1
             for x in range(current_piece.x + step_x, goal_piece.x, step_x):
-                temp_positions = [(x + dx, current_piece.y + dy) for (dx, dy) in current_piece.shape]
-                if any(pos in current_positions for pos in temp_positions):
+                if (table.mask_at(x, current_piece.y) or 0) & current_positions:
                     blocking_count += 1
                     break
         
@@ -214,13 +941,133 @@ def h3_blocking_pieces(current_state, goal_state):
             # Verificar si hay piezas en el camino vertical
             step_y = 1 if goal_piece.y > current_piece.y else -1
             for y in range(current_piece.y + step_y, goal_piece.y, step_y):
-                temp_positions = [(current_piece.x + dx, y + dy) for (dx, dy) in current_piece.shape]
-                if any(pos in current_positions for pos in temp_positions):
+                if (table.mask_at(current_piece.x, y) or 0) & current_positions:
                     blocking_count += 1
                     break
     
     return blocking_count
 
+def h4_pattern_database(current_state, goal_state):
+    """
+    Heurística 4: bases de datos de patrones aditivas (ver patterndb).
+    Distancias exactas al objetivo de cada pieza y de cada pareja de piezas
+    (ignorando el resto), combinadas sumando parejas disjuntas y tomando el
+    maximo entre particiones.  Admisible.  Las tablas se calculan una vez
+    por objetivo y tamaño de tablero y se guardan en disco.
+    """
+    return pattern_database(goal_state).value(current_state)
+
+#----------------------------------------------------------------------
+# Formas por lotes (NumPy) de las heuristicas: reciben una lista de estados
+# con las mismas clases de piezas y devuelven la lista de sus valores, iguales
+# a los de la heuristica original
+
+def h1_manhattan_batch(states, goal_state):
+    distances = batchheuristics.manhattan(batchheuristics.coordinates(states),
+                                          batchheuristics.coordinates([goal_state])[0])
+    return distances.sum(axis=1).tolist()
+
+def h2_weighted_manhattan_batch(states, goal_state):
+    distances = batchheuristics.manhattan(batchheuristics.coordinates(states),
+                                          batchheuristics.coordinates([goal_state])[0])
+    weights = [PIECE_WEIGHTS.get(p.__class__.__name__, 1.0) for p in states[0].piece_list]
+    return (distances * weights).sum(axis=1).tolist()
+
+def h3_blocking_pieces_batch(states, goal_state):
+    pieces = states[0].piece_list
+    blocked = batchheuristics.blocked_paths(
+        batchheuristics.coordinates(states), batchheuristics.coordinates([goal_state])[0],
+        [p.shape for p in pieces], goal_state.max_x, goal_state.max_y)
+    return blocked.sum(axis=1).tolist()
+
+# Numero minimo de estados para usar la forma por lotes: con lotes mas
+# pequeños el coste fijo de NumPy supera al de evaluar estado a estado
+BATCH_MIN_SIZE = 32
+
+# Heuristica -> forma por lotes (vacio sin NumPy)
+BATCH_HEURISTICS = {
+    h1_manhattan: h1_manhattan_batch,
+    h2_weighted_manhattan: h2_weighted_manhattan_batch,
+    h3_blocking_pieces: h3_blocking_pieces_batch
+} if batchheuristics.HAVE_NUMPY else {}
+
+def batch_form(heuristic):
+    # Forma por lotes de heuristic (o de la heuristica envuelta en un
+    # CachedHeuristic), o None si no tiene
+    if isinstance(heuristic, CachedHeuristic):
+        return heuristic.batch if heuristic.batch_heuristic is not None else None
+    return BATCH_HEURISTICS.get(heuristic)
+
+#----------------------------------------------------------------------
+
+class CachedHeuristic:
+    """
+    Envoltorio con cache de cualquier funcion heuristica.  Los valores se
+    guardan por (clave del estado, clave del objetivo), de modo que un mismo
+    objeto puede compartirse entre varias llamadas a test_algorithm con el
+    mismo objetivo.  Con maxsize entradas como maximo se descarta la usada
+    hace mas tiempo (LRU); con maxsize=None la cache no tiene limite.
+    Atributos:
+       hits, misses: numero de aciertos y fallos de la cache
+    Ejemplo:
+       h = CachedHeuristic(h3_blocking_pieces, maxsize=50000)
+       a_star(init_state, goal_state, h)
+    """
+    def __init__(self, heuristic, maxsize=100000):
+        self.heuristic = heuristic
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # Mismo nombre que la heuristica envuelta (usado en los informes)
+        self.__name__ = heuristic.__name__
+        self.batch_heuristic = BATCH_HEURISTICS.get(heuristic)
+
+    def __call__(self, current_state, goal_state):
+        key = (current_state.key(), goal_state.key())
+        value = self.cache.get(key)
+        if value is not None:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return value
+        self.misses += 1
+        value = self.heuristic(current_state, goal_state)
+        self.cache[key] = value
+        if self.maxsize is not None and len(self.cache) > self.maxsize:
+            self.cache.popitem(last=False)
+        return value
+
+    def batch(self, states, goal_state):
+        # Forma por lotes: los fallos de la cache se calculan juntos con la
+        # forma por lotes de la heuristica envuelta
+        goal_key = goal_state.key()
+        values = []
+        missing = []
+        for i, state in enumerate(states):
+            key = (state.key(), goal_key)
+            value = self.cache.get(key)
+            if value is not None:
+                self.hits += 1
+                self.cache.move_to_end(key)
+            else:
+                missing.append(i)
+            values.append(value)
+        if missing:
+            self.misses += len(missing)
+            computed = self.batch_heuristic([states[i] for i in missing], goal_state)
+            for i, value in zip(missing, computed):
+                values[i] = value
+                self.cache[(states[i].key(), goal_key)] = value
+            if self.maxsize is not None:
+                while len(self.cache) > self.maxsize:
+                    self.cache.popitem(last=False)
+        return values
+
+    def clear(self):
+        self.cache.clear()
+        self.hits = 0
+        self.misses = 0
+
 #----------------------------------------------------------------------
 
 def show_solution(node, expanded, generated):
@@ -0,0 +1,145 @@
+# This module defines the persistent store of the solutions found by the
+# search algorithms
+#----------------------------------------------------------------------------
+
+import json, os, sqlite3
+
+# Default database file of the solution store
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'solutions.sqlite')
+
+# Seconds a writer waits for the lock held by another process
+LOCK_TIMEOUT = 30.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS solutions (
+    init_key TEXT, goal_key TEXT, max_x INTEGER, max_y INTEGER,
+    actions TEXT, steps INTEGER, optimal INTEGER, algorithm TEXT,
+    PRIMARY KEY (init_key, goal_key, max_x, max_y)
+);
+CREATE TABLE IF NOT EXISTS path_states (
+    state_key TEXT, goal_key TEXT, max_x INTEGER, max_y INTEGER,
+    init_key TEXT, position INTEGER,
+    PRIMARY KEY (state_key, goal_key, max_x, max_y)
+);
+"""
+
+#----------------------------------------------------------------------------
+
+class SolutionCache:
+    """
+    Solutions stored in a SQLite database, keyed by the keys
+    (TutrisState.key()) of the initial and goal states and the board size.
+    Each entry records the actions of the solution (as returned by
+    reconstruct_path), whether it is proven optimal and the algorithm that
+    found it.  store() keeps the best solution of each problem: an optimal
+    one over a non optimal one, and the shorter one otherwise.
+
+    The states along an optimal solution are also indexed: every suffix of
+    an optimal path is an optimal path, so lookup() answers too for any
+    intermediate state of a cached optimal solution.
+
+    SQLite locks the file, so several processes can write at once; the
+    connection is opened lazily, so the object can be sent to other
+    processes before being used.
+
+    Example:
+       cache = SolutionCache()
+       entry = cache.lookup(init_state, goal_state)
+       if entry is None:
+           ...
+           cache.store(init_state, goal_state, steps, True, "A*")
+    """
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        self._connection = None
+
+    def __getstate__(self):
+        return {'path': self.path, '_connection': None}
+
+    def connection(self):
+        if self._connection is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            if not os.path.isdir(directory):
+                os.makedirs(directory, exist_ok=True)
+            # isolation_level=None: transactions are opened explicitly
+            self._connection = sqlite3.connect(self.path, timeout=LOCK_TIMEOUT, isolation_level=None)
+            self._connection.executescript(SCHEMA)
+        return self._connection
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def lookup(self, init_state, goal_state):
+        """
+        Returns a dictionary with the 'actions', 'optimal' and 'algorithm'
+        of the stored solution from init_state to goal_state, or None
+        """
+        db = self.connection()
+        goal_key = state_key(goal_state)
+        size = (goal_state.max_x, goal_state.max_y)
+        row = db.execute("SELECT actions, optimal, algorithm FROM solutions "
+                         "WHERE init_key = ? AND goal_key = ? AND max_x = ? AND max_y = ?",
+                         (state_key(init_state), goal_key) + size).fetchone()
+        if row is not None:
+            return {'actions': decode_actions(row[0]), 'optimal': bool(row[1]), 'algorithm': row[2]}
+        # Estado intermedio de una solucion optima: el resto del camino
+        row = db.execute("SELECT s.actions, s.algorithm, p.position FROM path_states p "
+                         "JOIN solutions s ON s.init_key = p.init_key AND s.goal_key = p.goal_key "
+                         "AND s.max_x = p.max_x AND s.max_y = p.max_y "
+                         "WHERE p.state_key = ? AND p.goal_key = ? AND p.max_x = ? AND p.max_y = ?",
+                         (state_key(init_state), goal_key) + size).fetchone()
+        if row is not None:
+            return {'actions': decode_actions(row[0])[row[2]:], 'optimal': True, 'algorithm': row[1]}
+        return None
+
+    def store(self, init_state, goal_state, actions, optimal, algorithm):
+        """
+        Stores the solution actions from init_state to goal_state unless a
+        better one is already stored.  Returns True if it has been stored.
+        """
+        db = self.connection()
+        key = (state_key(init_state), state_key(goal_state), goal_state.max_x, goal_state.max_y)
+        # BEGIN IMMEDIATE toma el bloqueo de escritura antes de leer, de modo
+        # que la comparacion con la solucion guardada no compite con otros
+        # procesos
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT steps, optimal FROM solutions WHERE init_key = ? AND goal_key = ? "
+                             "AND max_x = ? AND max_y = ?", key).fetchone()
+            if row is not None and (row[1], -row[0]) >= (int(bool(optimal)), -len(actions)):
+                db.execute("ROLLBACK")
+                return False
+            db.execute("INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                       key + (encode_actions(actions), len(actions), int(bool(optimal)), algorithm))
+            if optimal:
+                db.executemany("INSERT OR IGNORE INTO path_states VALUES (?, ?, ?, ?, ?, ?)",
+                               [(state_key(state), key[1], key[2], key[3], key[0], position)
+                                for position, state in enumerate(path_states(init_state, actions))
+                                if position > 0])
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return True
+
+#----------------------------------------------------------------------------
+
+def state_key(state):
+    # Text form of TutrisState.key() used in the database
+    return repr(state.key())
+
+def encode_actions(actions):
+    return json.dumps([list(action) for action in actions])
+
+def decode_actions(text):
+    # Las acciones (indice de pieza, movimiento) vuelven a ser tuplas
+    return [tuple(action) for action in json.loads(text)]
+
+def path_states(init_state, actions):
+    # States visited by applying actions from init_state (init_state included)
+    states = [init_state]
+    for action in actions:
+        states.append(states[-1].successor(action))
+    return states
@@ -1,14 +1,46 @@
 from pieces import *
+import gridexpansion
 
 class TutrisState:
     """
     State of the Tutris game
     Each object contains a list with the pieces included
+    With bitboard=True the state is validated with integer occupancy
+    masks (see pieces.board_layout) instead of sets of positions
+    With grid=True next_states finds the legal moves with the NumPy grid
+    engine (see gridexpansion) when NumPy is available
+    With partial_order=True next_states skips the moves that commute with
+    the move that produced the state and only lead to a transposition (see
+    next_states)
+    With dead_check (a deadstates.DeadStateCheck of the goal state)
+    next_states skips the successors from which the goal cannot be reached
+    With macro='slides' next_states slides each piece k cells in one action
+    (piece, movement, k) of cost k, for every k up to the first collision;
+    with macro='blocked' only the one-cell move and the slide until the
+    piece is blocked (see action_cost and unit_actions)
+    The list of pieces is stored as a tuple shared with the successors
+    whenever possible, and the key is computed once and kept packed as a
+    flat tuple of coordinates (see key)
     """    
-    def __init__(self, piece_list, max_x=8, max_y=8):
-        self.piece_list = piece_list
+    __slots__ = ('piece_list', 'max_x', 'max_y', 'bitboard', 'grid', 'partial_order', 'dead_check',
+                 'macro', '_occupied', '_key', '_last')
+
+    def __init__(self, piece_list, max_x=8, max_y=8, bitboard=False, grid=False, partial_order=False,
+                 dead_check=None, macro=None):
+        self.piece_list = tuple(piece_list)
         self.max_x = max_x
         self.max_y = max_y
+        self.bitboard = bitboard
+        self.grid = grid
+        self.partial_order = partial_order
+        self.dead_check = dead_check
+        self.macro = macro
+        # Mascara de ocupacion (ver occupancy), -1 si aun no se ha calculado
+        self._occupied = -1
+        self._key = None
+        # (pieza, mascara anterior de la pieza) del movimiento que produjo
+        # este estado en next_states con partial_order, o None
+        self._last = None
         
     def __str__(self):
         board = [[' ' for i in range(self.max_x)] for j in range(self.max_y)]
@@ -18,70 +50,298 @@ class TutrisState:
         
     def __eq__(self, other):
         if other:
-            for i in range(len(self.piece_list)):
-                if self.piece_list[i] != other.piece_list[i]:
-                    return False
-            return True
+            return self.key() == other.key()
         else:
             return False
 
     def key(self):
         """Return a canonical, hashable key for the state.
 
-        The key is a tuple of (class_name, x, y) for each piece in order.
+        The key is a flat tuple (class_names, x0, y0, x1, y1, ...) where
+        class_names is the tuple of class names of the pieces in order.
+        class_names is shared between a state and its successors, so each
+        key only adds the coordinates.  The key is computed once and cached.
         """
-        return tuple((p.__class__.__name__, p.x, p.y) for p in self.piece_list)
+        if self._key is None:
+            names = tuple(p.__class__.__name__ for p in self.piece_list)
+            coords = []
+            for p in self.piece_list:
+                coords.append(p.x)
+                coords.append(p.y)
+            self._key = (names,) + tuple(coords)
+        return self._key
 
     def __hash__(self):
         return hash(self.key())
     
     
     def successor(self, action):
+        """
+        Returns the state reached by applying action, or None if the
+        resulting state is not valid.  A macro action (piece, movement, k)
+        is applied as k one-cell moves.  Only the moved piece is copied: the
+        rest of the pieces are shared with this state (pieces must not be
+        mutated once they belong to a state), and only the cells newly
+        entered by the moved piece (see pieces.PieceTable) are checked
+        against the occupancy mask of this state.
+        """
+        if len(action) == 3:
+            state = self
+            for unit in unit_actions([action]):
+                state = state.successor(unit)
+                if state is None:
+                    return None
+            return state
         # Desempaquetar la acción
         num_pieza, movimiento = action
-        # Copiar todas las piezas
-        nuevas_piezas = [p.copy() for p in self.piece_list]
-        # Seleccionar la pieza a mover
-        pieza = nuevas_piezas[num_pieza]
-        # Aplicar el movimiento
+        pieza = self.piece_list[num_pieza]
+        occupied = self.occupancy()
+        if occupied is None:
+            # Estado de partida no valido: mover y validar el estado completo
+            return self._full_successor(num_pieza, movimiento)
+        table = piece_table(pieza.__class__, self.max_x, self.max_y)
+        move = table.moves[(pieza.x, pieza.y)].get(movimiento)
+        if move is None:
+            return None  # Movimiento no válido o fuera del tablero
+        nx, ny, new_mask, enter_mask = move
+        # Validar solo las celdas en las que entra la pieza movida
+        if enter_mask & occupied:
+            return None
+        return self._moved(num_pieza, nx, ny, table.masks[(pieza.x, pieza.y)], new_mask)
+
+    def _moved(self, num_pieza, nx, ny, old_mask, new_mask):
+        # Nuevo estado con la pieza num_pieza en (nx, ny), que comparte el
+        # resto de piezas con este estado
+        nuevas_piezas = list(self.piece_list)
+        nuevas_piezas[num_pieza] = self.piece_list[num_pieza].__class__(nx, ny)
+        nuevo_estado = TutrisState(nuevas_piezas, self.max_x, self.max_y, self.bitboard, self.grid,
+                                   self.partial_order, self.dead_check, self.macro)
+        if self._key is not None:
+            # Clave del sucesor: solo cambian las coordenadas de la pieza movida
+            k = list(self._key)
+            k[2 * num_pieza + 1] = nx
+            k[2 * num_pieza + 2] = ny
+            nuevo_estado._key = tuple(k)
+        nuevo_estado._occupied = (self._occupied ^ old_mask) | new_mask
+        return nuevo_estado
+
+    def _full_successor(self, num_pieza, movimiento):
+        # Sucesor sin tablas: copia la pieza, la mueve y valida todo el estado
+        nueva = self.piece_list[num_pieza].copy()
         if movimiento == 'LEFT':
-            pieza.move_left()
+            nueva.move_left()
         elif movimiento == 'RIGHT':
-            pieza.move_right()
+            nueva.move_right()
         elif movimiento == 'DOWN':
-            pieza.move_down()
+            nueva.move_down()
         else:
             return None  # Movimiento no válido
-        # Crear el nuevo estado
-        nuevo_estado = TutrisState(nuevas_piezas, self.max_x, self.max_y)
-        # Validar el nuevo estado
-        if nuevo_estado.is_valid():
-            return nuevo_estado
-        else:
-            return None
+        nuevas_piezas = list(self.piece_list)
+        nuevas_piezas[num_pieza] = nueva
+        nuevo_estado = TutrisState(nuevas_piezas, self.max_x, self.max_y, self.bitboard, self.grid,
+                                   self.partial_order, self.dead_check, self.macro)
+        return nuevo_estado if nuevo_estado.is_valid() else None
         
     def is_valid(self):
         # Comprobar que todas las piezas están dentro de los límites y no se solapan
+        if self.bitboard:
+            return self.occupancy() is not None
         all_cells = set()
         for p in self.piece_list:
-            for (x, y) in p.occupied_positions():
-                # Comprobar límites
-                if not (0 <= x < self.max_x and 0 <= y < self.max_y):
-                    return False
+            # Las tablas solo contienen posiciones dentro de los límites
+            cells = piece_table(p.__class__, self.max_x, self.max_y).cells.get((p.x, p.y))
+            if cells is None:
+                return False
+            for cell in cells:
                 # Comprobar colisión
-                if (x, y) in all_cells:
+                if cell in all_cells:
                     return False
-                all_cells.add((x, y))
+                all_cells.add(cell)
         return True
     
+    def occupancy(self):
+        # Mascara de celdas ocupadas, o None si el estado no es valido
+        if self._occupied != -1:
+            return self._occupied
+        occupied = 0
+        for p in self.piece_list:
+            m = piece_table(p.__class__, self.max_x, self.max_y).masks.get((p.x, p.y))
+            # Fuera de limites o colision
+            if m is None or m & occupied:
+                occupied = None
+                break
+            occupied |= m
+        self._occupied = occupied
+        return occupied
+
     def next_states(self):
+        """
+        Returns the list of (state, action) of the valid successors.
+
+        With partial_order, a move of piece j is skipped when this state was
+        produced by a move of a piece i > j and the cells entered by piece j
+        are not among the cells that piece i has just left.  Then moving j
+        first and i afterwards is also valid and reaches the same state with
+        the same cost, so only the orderings of commuting moves with
+        non-decreasing piece indices are generated.  Every state is still
+        generated, at its optimal depth, by searches that keep a node with
+        optimal g per state (breadth-first, uniform cost, A* with a
+        consistent heuristic): if the skipped successor cannot be reached
+        through the parent with the two moves swapped, the move skipped
+        there belongs to a piece with a higher index, which is finite.
+
+        With dead_check, the successors reached by a DOWN move that are dead
+        (see deadstates.DeadStateCheck) are skipped.
+
+        With macro, the slides of several cells are generated as single
+        actions (piece, movement, k) next to the one-cell moves (piece,
+        movement).  Every one-cell move is still generated, so searches that
+        add the cost of the actions (action_cost) to g find the same optimal
+        costs; partial_order does not apply to macro actions.
+        """
+        if self.dead_check is not None:
+            check = self.dead_check
+            return [(state, action) for (state, action) in self._successors()
+                    if action[1] != 'DOWN' or not check.dead_after(state, action[0])]
+        return self._successors()
+
+    def _successors(self):
+        # Todos los sucesores validos (ver next_states)
+        new_states = []
+        occupied = self.occupancy()
+        if occupied is None:
+            # Estado no valido: probar cada movimiento por separado
+            for i in range(len(self.piece_list)):
+                for mov, _ in MOVEMENTS:
+                    nuevo_estado = self._full_successor(i, mov)
+                    if nuevo_estado is not None:
+                        new_states.append((nuevo_estado, (i, mov)))
+            return new_states
+        if self.macro:
+            return self._macro_next_states(occupied)
+        if self.grid and gridexpansion.HAVE_NUMPY:
+            return self._grid_next_states()
+        if self.partial_order:
+            return self._reduced_next_states(occupied)
+        for i in range(len(self.piece_list)):
+            p = self.piece_list[i]
+            table = piece_table(p.__class__, self.max_x, self.max_y)
+            old_mask = table.masks[(p.x, p.y)]
+            # Solo los movimientos que mantienen la pieza dentro del tablero
+            for mov, (nx, ny, new_mask, enter_mask) in table.moves[(p.x, p.y)].items():
+                if not enter_mask & occupied:
+                    new_states.append((self._moved(i, nx, ny, old_mask, new_mask), (i, mov)))
+        return new_states
+
+    def _reduced_next_states(self, occupied):
+        # next_states con partial_order: se omiten los movimientos que
+        # conmutan con el anterior (ver next_states)
         new_states = []
-        movimientos = ['LEFT', 'RIGHT', 'DOWN']
+        last_piece, left = self._last if self._last is not None else (0, 0)
         for i in range(len(self.piece_list)):
-            for mov in movimientos:
-                accion = (i, mov)
-                nuevo_estado = self.successor(accion)
-                if nuevo_estado is not None:
-                    new_states.append((nuevo_estado, accion))
+            p = self.piece_list[i]
+            table = piece_table(p.__class__, self.max_x, self.max_y)
+            old_mask = table.masks[(p.x, p.y)]
+            for mov, (nx, ny, new_mask, enter_mask) in table.moves[(p.x, p.y)].items():
+                if enter_mask & occupied:
+                    continue
+                if i < last_piece and not enter_mask & left:
+                    continue
+                new_states.append((self._moved_after(i, nx, ny, old_mask, new_mask), (i, mov)))
         return new_states
 
+    def _macro_next_states(self, occupied):
+        # next_states con macro: cada pieza se desliza en cada direccion
+        # hasta la primera colision
+        new_states = []
+        only_blocked = self.macro == 'blocked'
+        for i in range(len(self.piece_list)):
+            p = self.piece_list[i]
+            table = piece_table(p.__class__, self.max_x, self.max_y)
+            old_mask = table.masks[(p.x, p.y)]
+            # Celdas ocupadas por las demas piezas
+            others = occupied & ~old_mask
+            for mov, _ in MOVEMENTS:
+                slides = []
+                position = (p.x, p.y)
+                while True:
+                    move = table.moves[position].get(mov)
+                    if move is None or move[3] & others:
+                        break
+                    slides.append(move)
+                    position = (move[0], move[1])
+                for k, (nx, ny, new_mask, enter_mask) in enumerate(slides, 1):
+                    if only_blocked and 1 < k < len(slides):
+                        continue
+                    action = (i, mov) if k == 1 else (i, mov, k)
+                    new_states.append((self._moved(i, nx, ny, old_mask, new_mask), action))
+        return new_states
+
+    def _moved_after(self, num_pieza, nx, ny, old_mask, new_mask):
+        # Sucesor de next_states: con partial_order recuerda el movimiento
+        nuevo_estado = self._moved(num_pieza, nx, ny, old_mask, new_mask)
+        if self.partial_order:
+            nuevo_estado._last = (num_pieza, old_mask)
+        return nuevo_estado
+
+    def _grid_next_states(self):
+        # Motor NumPy (ver gridexpansion): los movimientos legales de todas
+        # las piezas se calculan a la vez y solo se construyen esos sucesores
+        new_states = []
+        legal = gridexpansion.legal_moves(self).tolist()
+        last_piece, left = self._last if self._last is not None else (0, 0)
+        for i in range(len(self.piece_list)):
+            if not any(legal[i]):
+                continue
+            p = self.piece_list[i]
+            table = piece_table(p.__class__, self.max_x, self.max_y)
+            moves = table.moves[(p.x, p.y)]
+            old_mask = table.masks[(p.x, p.y)]
+            for m in range(len(MOVEMENTS)):
+                if legal[i][m]:
+                    mov = MOVEMENTS[m][0]
+                    nx, ny, new_mask, enter_mask = moves[mov]
+                    if i < last_piece and not enter_mask & left:
+                        continue
+                    new_states.append((self._moved_after(i, nx, ny, old_mask, new_mask), (i, mov)))
+        return new_states
+
+    def previous_states(self):
+        """
+        Reversed expansion: returns the list of (state, action) such that
+        state.successor(action) is this state.  Used to search backwards
+        from the goal state (LEFT, RIGHT and DOWN are undone by moving the
+        piece RIGHT, LEFT and UP).
+        """
+        prev_states = []
+        occupied = self.occupancy()
+        if occupied is None:
+            return prev_states
+        for i in range(len(self.piece_list)):
+            p = self.piece_list[i]
+            table = piece_table(p.__class__, self.max_x, self.max_y)
+            old_mask = table.masks[(p.x, p.y)]
+            for mov, (px, py, prev_mask, enter_mask) in table.unmoves[(p.x, p.y)].items():
+                if not enter_mask & occupied:
+                    prev_states.append((self._moved(i, px, py, old_mask, prev_mask), (i, mov)))
+        return prev_states
+
+#----------------------------------------------------------------------
+# Macro actions
+
+def action_cost(action):
+    # Coste de una accion: k para un deslizamiento (pieza, movimiento, k), 1 si no
+    return action[2] if len(action) == 3 else 1
+
+def unit_actions(actions):
+    """
+    The actions with every macro action (piece, movement, k) replaced by
+    k one-cell actions (piece, movement)
+    """
+    steps = []
+    for action in actions:
+        if len(action) == 3:
+            steps.extend([(action[0], action[1])] * action[2])
+        else:
+            steps.append(action)
+    return steps
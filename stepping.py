@@ -0,0 +1,106 @@
+# This module defines the budgets and progress reports of the stepping
+# (generator) form of the search engines
+#----------------------------------------------------------------------
+
+import time, tracemalloc
+
+#----------------------------------------------------------------------
+
+class SearchBudget:
+    """
+    Limits enforced inside a search engine.  Any of them may be None:
+       max_expanded  maximum number of expanded nodes
+       max_memory    maximum memory in bytes allocated since the start of
+                     the search, as traced by tracemalloc (which is started
+                     for the search if it was not already running, with
+                     its usual slowdown)
+       time_limit    wall-clock seconds from the start of the search
+    When a limit is exceeded the engine stops, returns no solution and the
+    budget records in stopped the name of that limit ('expanded',
+    'memory' or 'deadline').  A budget can be reused for several searches:
+    start() resets it.
+
+    Example:
+       budget = SearchBudget(max_expanded=100000, time_limit=5)
+       solution, expanded, generated = depth_first(init, goal, budget=budget)
+       if budget.stopped: ...
+    """
+    # Expansiones entre dos medidas de memoria (tracemalloc es costoso)
+    MEMORY_INTERVAL = 256
+
+    def __init__(self, max_expanded=None, max_memory=None, time_limit=None):
+        self.max_expanded = max_expanded
+        self.max_memory = max_memory
+        self.time_limit = time_limit
+        self.stopped = None
+        self._deadline = None
+        self._base_memory = 0
+        self._started_tracing = False
+
+    def start(self):
+        self.stopped = None
+        if self.time_limit is not None:
+            self._deadline = time.perf_counter() + self.time_limit
+        if self.max_memory is not None:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            self._base_memory = tracemalloc.get_traced_memory()[0]
+
+    def stop(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def exceeded(self, expanded):
+        """
+        Name of the first limit exceeded after expanded expansions, or None.
+        The engines call it once per expansion.
+        """
+        if self.max_expanded is not None and expanded >= self.max_expanded:
+            self.stopped = 'expanded'
+        elif self._deadline is not None and time.perf_counter() >= self._deadline:
+            self.stopped = 'deadline'
+        elif (self.max_memory is not None and expanded % self.MEMORY_INTERVAL == 0
+                and tracemalloc.get_traced_memory()[0] - self._base_memory >= self.max_memory):
+            self.stopped = 'memory'
+        return self.stopped
+
+#----------------------------------------------------------------------
+
+class SearchProgress:
+    """
+    Report yielded by the stepping form of a search engine:
+       node       node expanded last (the solution node in the final report)
+       expanded   nodes expanded so far
+       generated  nodes generated so far
+       frontier   number of nodes waiting in the frontier
+       done       True only in the last report of the search
+       solution   solution node (final report) or None
+       stopped    name of the budget limit that stopped the search, or None
+    """
+    __slots__ = ('node', 'expanded', 'generated', 'frontier', 'done', 'solution', 'stopped')
+
+    def __init__(self, node, expanded, generated, frontier, done=False, solution=None, stopped=None):
+        self.node = node
+        self.expanded = expanded
+        self.generated = generated
+        self.frontier = frontier
+        self.done = done
+        self.solution = solution
+        self.stopped = stopped
+
+    def __str__(self):
+        return "Expandidos: %d, Generados: %d, Frontera: %d%s" % (
+            self.expanded, self.generated, self.frontier,
+            " (limite: %s)" % self.stopped if self.stopped else "")
+
+def run_steps(steps):
+    """
+    Runs a stepping search to the end and returns (solution node or None,
+    expanded, generated) like the blocking engines
+    """
+    progress = None
+    for progress in steps:
+        pass
+    return (progress.solution, progress.expanded, progress.generated)
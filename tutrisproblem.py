@@ -1,28 +1,64 @@
-from state import TutrisState
+from state import TutrisState, unit_actions
 from pieces import *
-from tutrisworld import TutrisWorld
 from search import *
-import sys, time
+from instrumentation import Instrumentation
+from stepping import SearchBudget
+from solutioncache import SolutionCache, CACHE_PATH
+from deadstates import dead_state_check
+import sys, time, inspect, io, signal, multiprocessing, argparse
 
 #------------------------------------------------------------
 # FUNCIONES AUXILIARES
 def reconstruct_path(solution_node):
+    # Acciones de la solucion, con las macro acciones en pasos de una celda
     steps = []
     current = solution_node
     while current != None:
         if current.action != None:
             steps.insert(0, current.action)
         current = current.parent
-    return steps
+    return unit_actions(steps)
 
-def test_algorithm(algorithm, algorithm_name, init_state, goal_state, heuristic=None):
+def accepts_parameter(algorithm, name):
+    # True si la funcion algorithm admite el parametro name
+    return name in inspect.signature(algorithm).parameters
+
+# Heuristicas admisibles: con ellas A*, IDA* y A* anytime encuentran soluciones optimas
+ADMISSIBLE_HEURISTICS = (h0_zero, h1_manhattan, h4_pattern_database)
+
+def proves_optimality(algorithm, heuristic, macro=None):
+    # True si las soluciones de algorithm (con heuristic) son optimas.  Con
+    # macro acciones (macro) la anchura y la bidireccional minimizan el
+    # numero de acciones y no su coste
+    if algorithm in (uniform_cost, distance_table_path):
+        return True
+    if algorithm in (breadth_first, bidirectional):
+        return not macro
+    # Las heuristicas envueltas en CachedHeuristic se comparan por la original
+    heuristic = getattr(heuristic, 'heuristic', heuristic)
+    return algorithm in (a_star, ida_star, anytime_a_star) and heuristic in ADMISSIBLE_HEURISTICS
+
+def test_algorithm(algorithm, algorithm_name, init_state, goal_state, heuristic=None, stats=None,
+                   instrument=None, budget=None):
+    # stats: diccionario opcional que se pasa a los algoritmos que lo admiten
+    # (por ejemplo ida_star) para recoger estadisticas adicionales
+    # instrument: objeto Instrumentation opcional, para los algoritmos que lo admiten
+    # budget: objeto SearchBudget opcional; la busqueda se corta dentro del
+    # algoritmo al superar sus limites (budget.stopped indica cual)
     print("\n --- Probando %s ---" % algorithm_name)
+    kwargs = {}
+    if stats is not None and accepts_parameter(algorithm, 'stats'):
+        kwargs['stats'] = stats
+    if instrument is not None and accepts_parameter(algorithm, 'instrument'):
+        kwargs['instrument'] = instrument
+    if budget is not None and accepts_parameter(algorithm, 'budget'):
+        kwargs['budget'] = budget
     start_time = time.perf_counter()
     try:
         if heuristic:
-            solution, expanded, generated = algorithm(init_state, goal_state, heuristic)
+            solution, expanded, generated = algorithm(init_state, goal_state, heuristic, **kwargs)
         else:
-            solution, expanded, generated = algorithm(init_state, goal_state)
+            solution, expanded, generated = algorithm(init_state, goal_state, **kwargs)
     except Exception as e:
         print("Error durante la ejecucion de %s: %s" % (algorithm_name, str(e)))
         return None, [], 0, 0, float('inf')
@@ -36,6 +72,10 @@ def test_algorithm(algorithm, algorithm_name, init_state, goal_state, heuristic=
         print("  Pasos: %d, Expandidos: %d, Generados: %d" % (len(steps), expanded, generated))
         #show_solution(solution, expanded, generated)####################################
         return solution, steps, expanded, generated, execution_time ######################################
+    elif budget is not None and budget.stopped:
+        print("Busqueda cortada para %s en %.3f segundos (limite: %s)" % (algorithm_name, execution_time, budget.stopped))
+        print("  Expandidos: %d, Generados: %d" % (expanded, generated))
+        return None, [], expanded, generated, execution_time
     else:
         print("Solucion no encontrada para %s en %.3f segundos" % (algorithm_name, execution_time))
         print("  Expandidos: %d, Generados: %d" % (expanded, generated))
@@ -43,7 +83,39 @@ def test_algorithm(algorithm, algorithm_name, init_state, goal_state, heuristic=
 
 #------------------------------------------------------------
 # CONFIGURACIÓN DE PRUEBAS
-def run_complete_evaluation():
+def run_complete_evaluation(workers=0, timeout=None, instrument=False, max_expanded=None, max_memory=None,
+                            solution_cache=None, use_distance_table=False, partial_order=False,
+                            prune_dead=False, macro=None):
+    """
+    Ejecuta todos los algoritmos sobre todos los estados iniciales.
+    Parametros:
+       workers: numero de procesos en los que se reparten los trabajos
+           (estado inicial, algoritmo, heuristica); 0 para ejecutarlos en
+           este proceso, uno detras de otro
+       timeout: tiempo maximo en segundos de cada trabajo (None sin limite)
+       max_expanded, max_memory: limites de nodos expandidos y de bytes de
+           memoria de cada busqueda (None sin limite)
+       solution_cache: ruta opcional de un almacen de soluciones
+           (SolutionCache).  Los algoritmos optimos devuelven la solucion
+           optima guardada sin buscar, y las soluciones encontradas se guardan
+       use_distance_table: si es cierto se evalua tambien distance_table_path
+           (solucion optima leida de la tabla de distancias del objetivo, que
+           se construye antes de repartir los trabajos)
+       partial_order: si es cierto los estados iniciales se expanden con
+           reduccion de orden parcial (ver TutrisState.next_states): no se
+           generan las transposiciones de movimientos de piezas distintas
+           que conmutan
+       prune_dead: si es cierto los estados iniciales podan los estados
+           muertos, desde los que no se puede llegar al objetivo, y los pares
+           sin solucion se descartan antes de buscar (ver deadstates)
+       macro: 'slides' o 'blocked' para expandir los estados iniciales con
+           macro acciones (deslizamientos de varias celdas con su coste, ver
+           TutrisState.next_states); los pasos de las soluciones siguen
+           siendo movimientos de una celda
+       instrument: si es cierto, los algoritmos que lo admiten se ejecutan
+           con instrumentacion (tiempos por fase, nodos por segundo, picos de
+           frontera, explorados y memoria) y el informe la incluye
+    """
     # Initial states definition
     init_states = {
         "init_list1": [PieceBar(1,7), PieceL(1,3), PieceS(4,6), PieceSquare(0,4)],
@@ -59,15 +131,43 @@ def run_complete_evaluation():
     algorithms = [
         (breadth_first, "Busqueda primero en anchura", None),
         (depth_first, "Busqueda primero en profundidad", None),
-        (uniform_cost, "Busqueda de coste uniforme", None)
+        (uniform_cost, "Busqueda de coste uniforme", None),
+        (bidirectional, "Busqueda bidireccional", None)
     ]
 
+    if use_distance_table:
+        # Construir (o cargar) la tabla una sola vez: los procesos la mapean
+        distance_table(goal_state)
+        algorithms.append((distance_table_path, "Tabla de distancias", None))
+
     # Heuristics for informed search 
-    heuristics = [h0_zero, h1_manhattan, h2_weighted_manhattan, h3_blocking_pieces]    
+    heuristics = [h0_zero, h1_manhattan, h2_weighted_manhattan, h3_blocking_pieces, h4_pattern_database]    
+    # Cada heuristica se envuelve en una cache compartida por todos los
+    # estados iniciales (el objetivo es el mismo)
+    heuristics = [CachedHeuristic(h) for h in heuristics]
     for heuristic_func in heuristics:
         heuristic_name = heuristic_func.__name__
         algorithms.append((greedy, "Busqueda voraz (" + heuristic_name + ")", heuristic_func))
         algorithms.append((a_star, "A* (" + heuristic_name + ")", heuristic_func))
+        algorithms.append((ida_star, "IDA* (" + heuristic_name + ")", heuristic_func))
+        algorithms.append((anytime_a_star, "A* anytime (" + heuristic_name + ")", heuristic_func))
+
+    # Trabajos (estado inicial, algoritmo, heuristica) en orden de ejecucion.
+    # Con procesos no se puede compartir la cache de heuristicas: cada
+    # trabajo recibe la funcion heuristica original
+    jobs = []
+    cache = SolutionCache(solution_cache) if solution_cache else None
+    for state_name, piece_list in init_states.items():
+        init_state = TutrisState(piece_list, partial_order=partial_order,
+                                 dead_check=dead_state_check(goal_state) if prune_dead else None,
+                                 macro=macro)
+        for algorithm_func, algorithm_name, heuristic in algorithms:
+            if heuristic and workers:
+                heuristic = heuristic.heuristic
+            options = {'timeout': timeout, 'instrument': instrument,
+                       'max_expanded': max_expanded, 'max_memory': max_memory, 'cache': cache}
+            jobs.append((state_name, init_state, goal_state, algorithm_func,
+                         algorithm_name, heuristic, options))
 
     # Complete results
     all_results = []
@@ -75,54 +175,212 @@ def run_complete_evaluation():
 
     print("=" * 50)
     print(" Evaluacion completa de algoritmos de busqueda ")
+    if workers:
+        print(" (%d procesos en paralelo) " % workers)
+    if partial_order:
+        print(" (reduccion de orden parcial) ")
+    if prune_dead:
+        print(" (poda de estados muertos) ")
+    if macro:
+        print(" (macro acciones: %s) " % macro)
     print("=" * 50)
 
-    #Probar con cada estado inicial
-    for state_name, piece_list in init_states.items():
-        print("\n\n" + "-" * 50)
-        print(" Estado inicial: " + state_name)
-        print("-" * 50)
+    pool = None
+    if workers:
+        pool = multiprocessing.Pool(workers)
+        pending = [pool.apply_async(run_job, (job, True)) for job in jobs]
+    try:
+        current_state_name = None
+        for i in range(len(jobs)):
+            state_name, init_state, goal_state, algorithm_func, algorithm_name, heuristic, options = jobs[i]
+            #Probar con cada estado inicial
+            if state_name != current_state_name:
+                current_state_name = state_name
+                print("\n\n" + "-" * 50)
+                print(" Estado inicial: " + state_name)
+                print("-" * 50)
+            # Test algorithm (los resultados se recogen en el orden de los
+            # trabajos, por lo que el informe no depende del paralelismo)
+            if pool:
+                outcome = pending[i].get()
+                sys.stdout.write(outcome['output'])
+            else:
+                outcome = run_job(jobs[i])
+            record_result(all_results, best_solutions, jobs[i], outcome)
+    finally:
+        if pool:
+            pool.terminate()
+            pool.join()
 
-        init_state = TutrisState(piece_list)
+    if not workers:
+        print("\n\nCACHE DE HEURISTICAS " + '-' * 30)
+        for heuristic_func in heuristics:
+            print("  %s: %d aciertos, %d fallos" % (heuristic_func.__name__, heuristic_func.hits, heuristic_func.misses))
 
-        for algorithm_func, algorithm_name, heuristic in algorithms:
-            # Test algorithm
+    generate_report(all_results, best_solutions, partial_order)
+    return all_results, best_solutions
+
+#------------------------------------------------------------
+# EJECUCION DE TRABAJOS (SECUENCIAL O EN UN POOL DE PROCESOS)
+class JobTimeout(BaseException):
+    # Deriva de BaseException para que no la capture test_algorithm
+    pass
+
+def _raise_job_timeout(signum, frame):
+    raise JobTimeout()
+
+def run_job(job, capture_output=False):
+    """
+    Ejecuta un trabajo (state_name, init_state, goal_state, algorithm,
+    algorithm_name, heuristic, options) y devuelve un diccionario con el
+    resultado.  Es una funcion de modulo para que los trabajos puedan
+    enviarse a otros procesos.  Opciones:
+       timeout: si no es None, la busqueda se corta pasados timeout
+           segundos.  Los algoritmos que admiten budget lo comprueban en cada
+           expansion; el resto se interrumpe con SIGALRM (si existe)
+       max_expanded, max_memory: limites de nodos expandidos y de memoria
+           (bytes) de la busqueda, para los algoritmos que admiten budget
+       instrument: si es cierto, la busqueda se instrumenta y el resumen
+           se devuelve en la clave 'instrumentation'
+       cache: SolutionCache opcional.  Si el algoritmo es optimo y hay una
+           solucion optima guardada se devuelve sin buscar (clave 'cached');
+           las soluciones encontradas se guardan en el
+    Con capture_output, la salida de test_algorithm se devuelve en la clave
+    'output' en lugar de escribirse, para mostrarla en orden.
+    """
+    state_name, init_state, goal_state, algorithm, algorithm_name, heuristic, options = job
+    timeout = options.get('timeout')
+    cache = options.get('cache')
+    optimal = proves_optimality(algorithm, heuristic, init_state.macro)
+    if cache is not None and optimal:
+        outcome = cached_outcome(cache, job, capture_output)
+        if outcome is not None:
+            return outcome
+    instrument = None
+    if options.get('instrument') and accepts_parameter(algorithm, 'instrument'):
+        instrument = Instrumentation(trace_memory=True)
+    budget = None
+    if accepts_parameter(algorithm, 'budget'):
+        budget = SearchBudget(options.get('max_expanded'), options.get('max_memory'), timeout)
+    use_alarm = budget is None and timeout is not None and hasattr(signal, 'SIGALRM')
+    output = io.StringIO()
+    stdout = sys.stdout
+    if capture_output:
+        sys.stdout = output
+    stats = {}
+    outcome = {'timeout': False, 'budget': None, 'cached': False}
+    start_time = time.perf_counter()
+    try:
+        if use_alarm:
+            previous_handler = signal.signal(signal.SIGALRM, _raise_job_timeout)
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
             solution, steps, expanded, generated, exec_time = test_algorithm(
-                algorithm_func, algorithm_name, init_state, goal_state, heuristic
+                algorithm, algorithm_name, init_state, goal_state, heuristic, stats, instrument, budget
             )
+        finally:
+            if use_alarm:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+                signal.signal(signal.SIGALRM, previous_handler)
+    except JobTimeout:
+        print("Tiempo agotado para %s (%g segundos)" % (algorithm_name, timeout))
+        solution, steps, expanded, generated = None, [], 0, 0
+        exec_time = time.perf_counter() - start_time
+        outcome['timeout'] = True
+    finally:
+        sys.stdout = stdout
+    if budget is not None and budget.stopped:
+        # Limite del presupuesto que ha cortado la busqueda
+        outcome['budget'] = budget.stopped
+        outcome['timeout'] = budget.stopped == 'deadline'
+    if cache is not None and solution is not None:
+        # Una busqueda cortada (A* anytime) no prueba que la solucion sea optima
+        cache.store(init_state, goal_state, steps, optimal and not outcome['budget'], algorithm_name)
+    outcome.update({
+        'found': solution is not None,
+        'steps': steps,
+        'expanded': expanded,
+        'generated': generated,
+        'time': exec_time,
+        'iterations': stats.get('iterations', []),
+        'solutions': stats.get('solutions', []),
+        # Si SIGALRM interrumpe la busqueda la instrumentacion queda incompleta
+        'instrumentation': (instrument.summary() if instrument and not (outcome['timeout'] and use_alarm)
+                            else None),
+        'output': output.getvalue()
+    })
+    return outcome
+
+def cached_outcome(cache, job, capture_output):
+    # Resultado de run_job servido desde cache, o None si no hay una
+    # solucion optima guardada
+    state_name, init_state, goal_state, algorithm, algorithm_name, heuristic, options = job
+    start_time = time.perf_counter()
+    entry = cache.lookup(init_state, goal_state)
+    if entry is None or not entry['optimal']:
+        return None
+    exec_time = time.perf_counter() - start_time
+    text = ("\n --- Probando %s ---\n" % algorithm_name +
+            "Solucion en cache para %s (%s) en %.3f segundos\n" % (algorithm_name, entry['algorithm'], exec_time) +
+            "  Pasos: %d, Expandidos: 0, Generados: 0\n" % len(entry['actions']))
+    if not capture_output:
+        sys.stdout.write(text)
+    return {
+        'timeout': False, 'budget': None, 'cached': True,
+        'found': True,
+        'steps': entry['actions'],
+        'expanded': 0,
+        'generated': 0,
+        'time': exec_time,
+        'iterations': [],
+        'solutions': [],
+        'instrumentation': None,
+        'output': text if capture_output else ''
+    }
+
+def record_result(all_results, best_solutions, job, outcome):
+    # Anade el resultado de un trabajo a all_results y best_solutions
+    state_name, init_state, goal_state, algorithm_func, algorithm_name, heuristic, _ = job
+    steps = outcome['steps']
+    #Guardar resultados
+    result = {
+        'estado_inicial': state_name,
+        'algoritmo': algorithm_name,
+        'heuristica': heuristic.__name__ if heuristic else "N/A",
+        'solucion_encontrada': outcome['found'],
+        'pasos_solucion': len(steps) if outcome['found'] else 0,
+        'nodos_expandidos': outcome['expanded'],
+        'nodos_generados': outcome['generated'],
+        'tiempo_ejecucion': outcome['time'],
+        'tiempo_agotado': outcome['timeout'],
+        # Limite del presupuesto ('expanded', 'memory', 'deadline') o None
+        'limite_superado': outcome.get('budget'),
+        'desde_cache': outcome.get('cached', False),
+        'tiene_solucion_visualizable': outcome['found'] and len(steps) > 0,
+        # (umbral, expandidos acumulados) de cada iteracion de IDA*
+        'iteraciones': outcome['iterations'],
+        # (segundos, pasos, cota, peso, expandidos) de cada solucion de A* anytime
+        'soluciones_anytime': outcome['solutions'],
+        # Resumen de Instrumentation (None si no se ha instrumentado)
+        'instrumentacion': outcome['instrumentation']
+    }
+    all_results.append(result)
 
-            #Guardar resultados
-            result = {
-                'estado_inicial': state_name,
-                'algoritmo': algorithm_name,
-                'heuristica': heuristic.__name__ if heuristic else "N/A",
-                'solucion_encontrada': solution is not None,
-                'pasos_solucion': len(steps) if solution else 0,
-                'nodos_expandidos': expanded,
-                'nodos_generados': generated,
-                'tiempo_ejecucion': exec_time,
-                'tiene_solucion_visualizable': solution is not None and len(steps) > 0
+    # Guardar mejor solucion para visualizacion
+    if outcome['found'] and len(steps) > 0:
+        key = state_name + "_" + algorithm_name.replace(' ', '_')
+        if key not in best_solutions or len(steps) < len(best_solutions[key]['steps']):
+            best_solutions[key] = {
+                'algorithm': algorithm_name,
+                'steps': steps,
+                'state_name': state_name,
+                'init_state': init_state,
+                'goal_state': goal_state,
+                'pasos': len(steps),
+                'expandidos': outcome['expanded']
             }
-            all_results.append(result)
-
-            # Guardar mejor solucion para visualizacion
-            if solution and len(steps) > 0:
-                key = state_name + "_" + algorithm_name.replace(' ', '_')
-                if key not in best_solutions or len(steps) < len(best_solutions[key]['steps']):
-                    best_solutions[key] = {
-                        'algorithm': algorithm_name,
-                        'steps': steps,
-                        'state_name': state_name,
-                        'init_state': init_state,
-                        'goal_state': goal_state,
-                        'pasos': len(steps),
-                        'expandidos': expanded
-                    }
-
-    generate_report(all_results, best_solutions)
-    return all_results, best_solutions
 
-def generate_report(results, best_solutions):
+def generate_report(results, best_solutions, partial_order=False):
     # Generates detailed report of results
     print("\n\n" + "=" * 50)
     print(" RESUMEN DE RESULTADOS ")
@@ -142,14 +400,46 @@ def generate_report(results, best_solutions):
         total_tests = len(algorithm_data)
         avg_steps = sum(result['pasos_solucion'] for result in algorithm_data if result['solucion_encontrada']) / solutions_found if solutions_found > 0 else 0
         avg_expanded = sum(result['nodos_expandidos'] for result in algorithm_data) / total_tests
+        avg_generated = sum(result['nodos_generados'] for result in algorithm_data) / total_tests
         avg_time = sum(result['tiempo_ejecucion'] for result in algorithm_data) / total_tests
 
         print("\n" + algorithm_name + ":")
         print("  Soluciones encontradas: %d/%d (%.1f%%)" % (solutions_found, total_tests, (solutions_found / total_tests) * 100))
         print("  Pasos promedio: %.1f" % avg_steps)
         print("  Nodos expandidos promedio: %.1f" % avg_expanded)
+        print("  Nodos generados promedio: %.1f" % avg_generated)
         print("  Tiempo de ejecucion promedio: %.3f segundos" % avg_time)
 
+    # IDA* iterations
+    iterative_results = [result for result in results if result.get('iteraciones')]
+    if iterative_results:
+        print("\nITERACIONES DE IDA* " + '-' * 31)
+        for result in iterative_results:
+            print("  " + result['algoritmo'] + " (" + result['estado_inicial'] + "): " +
+                  format_iterations(result['iteraciones']))
+
+    # Anytime A* solutions
+    anytime_results = [result for result in results if result.get('soluciones_anytime')]
+    if anytime_results:
+        print("\nSOLUCIONES DE A* ANYTIME " + '-' * 25)
+        for result in anytime_results:
+            print("  " + result['algoritmo'] + " (" + result['estado_inicial'] + "): " +
+                  format_anytime_solutions(result['soluciones_anytime']))
+
+    # Instrumentation
+    instrumented_results = [result for result in results if result.get('instrumentacion')]
+    if instrumented_results:
+        print("\nINSTRUMENTACION " + '-' * 34)
+        print("  %-40s %-10s %10s %8s %8s %9s  %s" % ("Algoritmo", "Estado", "Nodos/s", "Frontera",
+              "Explor.", "Mem (KiB)", "ms por fase (" + "/".join(Instrumentation.PHASES) + ")"))
+        for result in instrumented_results:
+            figures = result['instrumentacion']
+            print("  %-40s %-10s %10.0f %8d %8d %9.1f  %s" % (
+                result['algoritmo'], result['estado_inicial'], figures['nodes_per_second'],
+                figures['peak_frontier'], figures['peak_explored'],
+                (figures['peak_memory'] or 0) / 1024.0,
+                "/".join("%.1f" % (figures['times'][phase] * 1000) for phase in Instrumentation.PHASES)))
+
     # Best solutions found
     print("\nMEJORES SOLUCIONES ENCONTRADAS " + '-' * 19)
     for key, solution in best_solutions.items():
@@ -161,22 +451,62 @@ def generate_report(results, best_solutions):
     with open(filename, 'w') as f:
         f.write("RESULTADOS BUSQUEDA TUTRIS\n")
         f.write("=" * 50 + "\n")
+        if partial_order:
+            f.write("Expansion con reduccion de orden parcial\n")
+            f.write("=" * 50 + "\n")
         for result in results:
             f.write("Algoritmo: %s\n" % result['algoritmo'])
-            f.write("Estado: %s, Solución: %s\n" % (result['estado_inicial'], "SÍ" if result['solucion_encontrada'] else "NO"))
+            f.write("Estado: %s, Solución: %s%s\n" % (result['estado_inicial'], "SÍ" if result['solucion_encontrada'] else "NO",
+                                                      format_budget_note(result)))
             f.write("Pasos: %d, Expandidos: %d, Generados: %d, Tiempo: %.4f\n" % (
                 result['pasos_solucion'],
                 result['nodos_expandidos'],
                 result.get('nodos_generados', 0),
                 result['tiempo_ejecucion']
             ))
+            if result.get('iteraciones'):
+                f.write("Iteraciones (umbral: expandidos acumulados): %s\n" % format_iterations(result['iteraciones']))
+            if result.get('soluciones_anytime'):
+                f.write("Soluciones (segundos: pasos, cota): %s\n" % format_anytime_solutions(result['soluciones_anytime']))
+            if result.get('instrumentacion'):
+                f.write("Instrumentacion: %s\n" % format_instrumentation(result['instrumentacion']))
             f.write("-" * 30 + "\n")
     
     print("\nResultados guardados en: " + filename)
     return results
 
+def format_budget_note(result):
+    # Nota sobre el limite que ha cortado la busqueda, p.ej. " (tiempo agotado)",
+    # o sobre las soluciones servidas desde el almacen de soluciones
+    if result.get('desde_cache'):
+        return " (desde cache)"
+    if result.get('tiempo_agotado'):
+        return " (tiempo agotado)"
+    if result.get('limite_superado'):
+        return " (limite de %s superado)" % result['limite_superado']
+    return ""
+
+def format_iterations(iterations):
+    # Umbral y expandidos acumulados de cada iteracion, p.ej. "5:103 6:208"
+    return ' '.join("%g:%d" % (threshold, expanded) for (threshold, expanded) in iterations)
+
+def format_anytime_solutions(solutions):
+    # Instante, pasos y cota de cada solucion mejorada, p.ej. "0.001s:13/1.44 0.002s:11/1"
+    return ' '.join("%.3fs:%d/%.3g" % (seconds, cost, bound)
+                    for (seconds, cost, bound, weight, expanded) in solutions)
+
+def format_instrumentation(figures):
+    # Cifras de Instrumentation.summary() en una linea
+    phases = ', '.join("%s %.4f s/%d" % (phase, figures['times'][phase], figures['calls'][phase])
+                       for phase in Instrumentation.PHASES)
+    return "Nodos/s: %.0f, Pico frontera: %d, Pico explorados: %d, Pico memoria: %d bytes, Fases: %s" % (
+        figures['nodes_per_second'], figures['peak_frontier'], figures['peak_explored'],
+        figures['peak_memory'] or 0, phases)
+
 def visualize_solution(solution):
     # Visualices a specific solution
+    # (tkinter solo se importa aqui: los procesos de evaluacion no lo necesitan)
+    from tutrisworld import TutrisWorld
     try:
         print("Ejecutando visualizacion con %d pasos..." % len(solution['steps']))
         world = TutrisWorld(
@@ -194,9 +524,36 @@ if __name__ == "__main__":
     print(" PRACTICA 1: ALGORITMOS DE BUSQUEDA ")
     print("=" * 80)
     
+    parser = argparse.ArgumentParser(description="Evaluacion de algoritmos de busqueda en Tutris")
+    parser.add_argument('--workers', type=int, default=0,
+                        help="procesos en paralelo (0: ejecucion secuencial)")
+    parser.add_argument('--timeout', type=float, default=None,
+                        help="tiempo maximo por trabajo en segundos")
+    parser.add_argument('--instrument', action='store_true',
+                        help="instrumentar las busquedas (tiempos por fase, picos de memoria)")
+    parser.add_argument('--max-expanded', type=int, default=None,
+                        help="nodos expandidos maximos por busqueda")
+    parser.add_argument('--max-memory', type=float, default=None,
+                        help="memoria maxima por busqueda en MiB")
+    parser.add_argument('--solution-cache', nargs='?', const=CACHE_PATH, default=None,
+                        help="almacen de soluciones (por defecto %s)" % CACHE_PATH)
+    parser.add_argument('--distance-table', action='store_true',
+                        help="evaluar tambien la tabla de distancias exactas del objetivo")
+    parser.add_argument('--partial-order', action='store_true',
+                        help="no generar las transposiciones de movimientos que conmutan")
+    parser.add_argument('--prune-dead', action='store_true',
+                        help="podar los estados desde los que no se puede llegar al objetivo")
+    parser.add_argument('--macro', choices=('slides', 'blocked'), default=None,
+                        help="deslizar las piezas varias celdas en una accion (todas las "
+                             "distancias, o solo hasta chocar)")
+    args = parser.parse_args()
+
     try:
         # Execute complete evaluation
-        all_results, best_solutions = run_complete_evaluation()
+        all_results, best_solutions = run_complete_evaluation(
+            args.workers, args.timeout, args.instrument, args.max_expanded,
+            int(args.max_memory * 1024 * 1024) if args.max_memory else None, args.solution_cache,
+            args.distance_table, args.partial_order, args.prune_dead, args.macro)
 
         # Show visualization
         # for key, solution in best_solutions.items(): ########################################
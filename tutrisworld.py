@@ -4,7 +4,7 @@ from tkinter import messagebox
 
 class TutrisWorld:
 
-	def __init__(self, initial_state, final_state, steps):
+	def __init__(self, initial_state, final_state, steps, delay=200, steps_per_frame=1):
 		# Consistency checks
 		for i in range(len(initial_state.piece_list)):
 			if initial_state.piece_list[i].__class__ != final_state.piece_list[i].__class__:
@@ -16,7 +16,12 @@ class TutrisWorld:
 		# Parameter initialization
 		self.state = initial_state
 		self.final_state = final_state		
-		self.steps = steps
+		# Las macro acciones se muestran paso a paso
+		self.steps = unit_actions(steps)
+		# Playback speed: milliseconds between frames and steps applied per frame
+		self.delay = delay
+		self.steps_per_frame = max(1, steps_per_frame)
+		self.playing = False
 		# Window creation
 		self.window = Tk()
 		self.window.resizable(False, False)
@@ -44,66 +49,89 @@ class TutrisWorld:
 		self.l_step = Label(self.window, text="", bg="black", fg="white", font=("Helvetica", 16))
 		self.l_step.place(x=770, y=200, anchor=CENTER)
 		self.canvas.pack()
-		self.draw()
+		self.create_items()
 		self.window.mainloop()
 		
 		
 	# NEXT STEP IN THE SOLUTION FOUND
 	def next_step(self):
-		self.b_next.config(state=DISABLED)
-		# NEXT STEP IN THE LIST
-		step = self.steps.pop(0)
-		self.l_step.config(text=str(step))		
-		self.state = self.state.successor(step)
-		if self.state == None:
-			self.b_auto.config(state=DISABLED)
-			messagebox.showerror("Error", "Incorrect action: %s" % str(step))
-			return
-		# FINISH CONDITIONS (GOAL ACHIEVED vs GOAL NOT ACHIEVED)
-		if self.state == self.final_state:
-			self.b_next.config(state=DISABLED)
-			self.b_auto.config(state=DISABLED)
-			self.draw()
-			messagebox.showinfo("Finished!", "Goal achieved! :)")
-			return
-		elif len(self.steps) == 0:
-			print(self.state)
-			print(self.final_state)
-			self.b_next.config(state=DISABLED)
-			self.b_auto.config(state=DISABLED)
+		if self.apply_steps(1):
 			self.draw()
-			messagebox.showwarning("Finished", "No steps left")
-			return
-		# REDRAW
-		self.draw()		
-		self.b_next.config(state=NORMAL)
-		self.canvas.update()
 		
 	
 	# AUTO STEP IN THE SOLUTION FOUND
 	def auto_step(self):
+		# Playback runs from after() callbacks, so the window keeps responding
 		self.b_auto.config(state=DISABLED)
 		self.b_next.config(state=DISABLED)
-		self.canvas.update()
-		while self.steps:
-			self.next_step()
-			self.b_next.config(state=DISABLED)
-			self.canvas.update()
-			self.canvas.after(200)
+		self.playing = True
+		self.window.after(self.delay, self.play)
+		
+	
+	def play(self):
+		# One frame of the playback: steps_per_frame steps, then the next frame
+		if not self.playing:
+			return
+		if self.apply_steps(self.steps_per_frame):
+			self.draw()
+			self.window.after(self.delay, self.play)
 		
+	
+	# APPLIES UP TO n STEPS; FALSE WHEN THE SOLUTION IS OVER
+	def apply_steps(self, n):
+		for i in range(n):
+			# NEXT STEP IN THE LIST
+			step = self.steps.pop(0)
+			self.l_step.config(text=str(step))		
+			self.state = self.state.successor(step)
+			if self.state == None:
+				self.finish()
+				messagebox.showerror("Error", "Incorrect action: %s" % str(step))
+				return False
+			# FINISH CONDITIONS (GOAL ACHIEVED vs GOAL NOT ACHIEVED)
+			if self.state == self.final_state:
+				self.finish()
+				messagebox.showinfo("Finished!", "Goal achieved! :)")
+				return False
+			elif len(self.steps) == 0:
+				print(self.state)
+				print(self.final_state)
+				self.finish()
+				messagebox.showwarning("Finished", "No steps left")
+				return False
+		return True
 		
-	# DRAWS THE SCENARIO
-	def draw(self):
-		self.canvas.delete(ALL)
+	
+	def finish(self):
+		self.playing = False
+		self.b_next.config(state=DISABLED)
+		self.b_auto.config(state=DISABLED)
+		if self.state != None:
+			self.draw()
+		
+	
+	# CREATES THE CANVAS ITEMS (ONCE)
+	def create_items(self):
 		# BACKGROUND
 		self.canvas.create_image(0, 0, image=self.back_image, anchor=NW)
 		# LOGO
 		self.canvas.create_image(770, 550, image=self.logo_image, anchor=CENTER)
 		# PIECES
+		self.piece_items = []
+		self.positions = []
+		for i in range(len(self.state.piece_list)):
+			p = self.state.piece_list[i]
+			self.piece_items.append(self.canvas.create_image(66 + p.x*66, p.y*66, image=self.piece_images[i], anchor=NW))
+			self.positions.append((p.x, p.y))
+		
+	
+	# DRAWS THE SCENARIO: MOVES THE PIECES THAT HAVE CHANGED
+	def draw(self):
 		for i in range(len(self.state.piece_list)):
 			p = self.state.piece_list[i]
-			self.canvas.create_image(66 + p.x*66, p.y*66, image=self.piece_images[i], anchor=NW)
-		self.canvas.update()
+			if self.positions[i] != (p.x, p.y):
+				self.canvas.coords(self.piece_items[i], 66 + p.x*66, p.y*66)
+				self.positions[i] = (p.x, p.y)
 		
 
 